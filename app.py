@@ -14,6 +14,9 @@ from datetime import timedelta
 import os
 from dotenv import load_dotenv
 from utils.cache_setup import background_callback_manager
+from utils.metrics import instrument_callbacks, render_metrics
+from utils.reference import METRICS_TOKEN
+from models.database import is_mongodb_ready
 
 
 # load env variables
@@ -45,6 +48,23 @@ app.layout = dmc.MantineProvider(
 
 server = app.server
 
+instrument_callbacks(app)
+
+
+@flask_server.route("/metrics")
+def metrics():
+    """per-callback histograms and MongoDB readiness, in the Prometheus text format"""
+    if METRICS_TOKEN and flask.request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        flask.abort(401)
+    gauges = [
+        (
+            "mongodb_up",
+            "1 if MongoDB answered the last ping (cached for MONGODB_READY_CACHE_TTL seconds)",
+            int(is_mongodb_ready()),
+        )
+    ]
+    return flask.Response(render_metrics(gauges), mimetype="text/plain; version=0.0.4")
+
 
 if __name__ == "__main__":
     app.run(debug=True)
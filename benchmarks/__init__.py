@@ -0,0 +1,3 @@
+"""
+Offline benchmarks for the investment board application.
+"""
@@ -0,0 +1,79 @@
+"""
+Microbenchmark of the compiled chart field extractor against the per-ticker
+chart_5y_df.itertuples() loop it replaced, on synthetic chart payloads
+(a tenth of them with meta fields removed). Exits non-zero if the outputs differ.
+
+    python -m benchmarks.chart_fields_benchmark --payloads 500 --repeat 5
+"""
+
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.stand_in_server import synthetic_chart_payload
+from models.chart_fields import chart_5y_df, extract_chart_fields
+
+
+def legacy_extract(base):
+    """the sheet-interpreting loop, kept as the reference"""
+    values = {}
+    missing = []
+    for row in chart_5y_df.itertuples(index=False):
+        if not row.include:
+            continue
+        try:
+            if pd.notna(row.api_key3):
+                value = base[row.api_key1][row.api_key2][0][row.api_key3]
+            elif pd.notna(row.api_key2):
+                value = base[row.api_key1][row.api_key2]
+            else:
+                value = base[row.api_key1]
+            values[row.field] = value
+        except (KeyError, IndexError, TypeError):
+            values[row.field] = None
+            missing.append(row.field)
+    return values, missing
+
+
+def _payloads(n_payloads):
+    payloads = []
+    for i in range(n_payloads):
+        base = synthetic_chart_payload(f"T{i:05d}", n_bars=30)["chart"]["result"][0]
+        if i % 10 == 0:
+            base["meta"].pop("regularMarketDayHigh")
+            base["meta"].pop("longName")
+        payloads.append(base)
+    return payloads
+
+
+def _time(extract, payloads, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        outputs = [extract(base) for base in payloads]
+    return time.perf_counter() - start, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--payloads", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payloads = _payloads(args.payloads)
+    legacy_time, legacy_outputs = _time(legacy_extract, payloads, args.repeat)
+    compiled_time, compiled_outputs = _time(extract_chart_fields, payloads, args.repeat)
+
+    n = args.payloads * args.repeat
+    print(f"payloads={args.payloads} repeat={args.repeat}")
+    print(f"itertuples loop: {legacy_time * 1e6 / n:8.1f} us/payload")
+    print(f"compiled:        {compiled_time * 1e6 / n:8.1f} us/payload")
+    print(f"speedup:         {legacy_time / compiled_time:8.1f}x")
+    identical = legacy_outputs == compiled_outputs
+    print(f"identical:       {identical}")
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Check of the CircuitBreaker state machine (utils/circuit_breaker.py), including a
+half-open probe that never reports back, as when the Reload cancel button kills
+the background job running it. Runs on a temporary diskcache, so the app's
+circuit state is not touched. Exits non-zero on any failed step. No network or
+database is needed.
+
+    python -m benchmarks.circuit_breaker_check --reset-timeout 0.2
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+
+import diskcache
+
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def _allowed(breaker):
+    try:
+        breaker.before_call()
+        return True
+    except CircuitOpenError:
+        return False
+
+
+def run(breaker, reset_timeout):
+    """yields (step, ok) for every step"""
+    yield "closed at start", breaker.state() == CLOSED and _allowed(breaker)
+
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    yield "opens after failure_threshold failures", breaker.state() == OPEN
+    yield "rejects while open", not _allowed(breaker)
+
+    time.sleep(reset_timeout * 1.1)
+    yield "lets one probe through after reset_timeout", _allowed(breaker)
+    yield "half-open while the probe is out", breaker.state() == HALF_OPEN
+    yield "rejects others while the probe is out", not _allowed(breaker)
+
+    # the probe never calls record_success / record_failure
+    time.sleep(reset_timeout * 1.1)
+    yield "lets a new probe through after an abandoned one", _allowed(breaker)
+    yield "rejects others while the new probe is out", not _allowed(breaker)
+
+    breaker.record_failure()
+    yield "a failed probe opens it again", breaker.state() == OPEN and not _allowed(breaker)
+
+    time.sleep(reset_timeout * 1.1)
+    probe = _allowed(breaker)
+    breaker.record_success()
+    yield "a successful probe closes it", probe and breaker.state() == CLOSED and _allowed(breaker)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--failure-threshold", type=int, default=2)
+    parser.add_argument("--reset-timeout", type=float, default=0.2)
+    args = parser.parse_args()
+
+    failed = 0
+    with tempfile.TemporaryDirectory() as directory, diskcache.Cache(directory) as cache:
+        breaker = CircuitBreaker(
+            cache,
+            "check",
+            failure_threshold=args.failure_threshold,
+            reset_timeout=args.reset_timeout,
+        )
+        for step, ok in run(breaker, args.reset_timeout):
+            print(f"{'ok  ' if ok else 'FAIL'} {step}")
+            failed += not ok
+
+    if failed:
+        print(f"{failed} failed steps")
+        sys.exit(1)
+    print("circuit breaker ok")
+
+
+if __name__ == "__main__":
+    main()
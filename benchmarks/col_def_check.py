@@ -0,0 +1,115 @@
+"""
+Check that editing the col_def sheet of input_column_definitions.xlsx left its
+existing rows alone.
+
+Every row of the sheet at a git ref (--base, by default the root commit) must
+still be in the working copy, cell for cell, in the same order relative to the
+other existing rows, and create_portfolio_table_col_defs must build the same grid
+column for it. Rows may only be added. Exits non-zero on any difference. No
+network or database is needed.
+
+    python -m benchmarks.col_def_check
+    python -m benchmarks.col_def_check --base HEAD
+"""
+
+import argparse
+import io
+import subprocess
+import sys
+
+import pandas as pd
+
+from utils.portfolio_table_inputs import create_portfolio_table_col_defs
+from utils.reference import INPUT_FIELDS_FILE_PATH
+
+SHEET = "col_def"
+SHEET_PATH = INPUT_FIELDS_FILE_PATH.relative_to(
+    INPUT_FIELDS_FILE_PATH.parent.parent
+).as_posix()
+
+
+def _git(*args):
+    return subprocess.run(["git", *args], capture_output=True, check=True).stdout
+
+
+def _root_commit():
+    return _git("rev-list", "--max-parents=0", "HEAD").decode().split()[0]
+
+
+def _read_sheet_at(ref):
+    content = _git("show", f"{ref}:{SHEET_PATH}")
+    return pd.read_excel(io.BytesIO(content), sheet_name=SHEET)
+
+
+def _grid_columns(col_def):
+    """grid column definition by field"""
+    return {
+        column["field"]: column
+        for group in create_portfolio_table_col_defs(col_def)
+        for column in group["children"]
+    }
+
+
+def _same(a, b):
+    return (pd.isna(a) and pd.isna(b)) if pd.isna(a) or pd.isna(b) else a == b
+
+
+def compare(base, current):
+    """returns a list of differences of the existing rows of base in current"""
+    problems = []
+    if list(base.columns) != list(current.columns):
+        problems.append(f"columns changed: {list(base.columns)} -> {list(current.columns)}")
+        return problems
+
+    current_rows = current.set_index("field", drop=False)
+    missing = [field for field in base["field"] if field not in current_rows.index]
+    problems += [f"{field}: row removed" for field in missing]
+
+    kept = [field for field in base["field"] if field in current_rows.index]
+    order = [field for field in current["field"] if field in set(kept)]
+    if order != kept:
+        problems.append("existing rows were reordered")
+
+    for _, row in base.iterrows():
+        if row["field"] in missing:
+            continue
+        new = current_rows.loc[row["field"]]
+        for column in base.columns:
+            if not _same(row[column], new[column]):
+                problems.append(f"{row['field']}.{column}: {row[column]!r} -> {new[column]!r}")
+
+    base_grid = _grid_columns(base)
+    current_grid = _grid_columns(current)
+    for field, column in base_grid.items():
+        if current_grid.get(field) != column:
+            problems.append(f"{field}: grid column definition changed")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--base",
+        default=None,
+        help="git ref of the sheet to compare with (default: the root commit)",
+    )
+    args = parser.parse_args()
+
+    base_ref = args.base or _root_commit()
+    print(f"comparing with {base_ref}")
+    base = _read_sheet_at(base_ref)
+    current = pd.read_excel(INPUT_FIELDS_FILE_PATH, sheet_name=SHEET)
+    problems = compare(base, current)
+
+    added = [field for field in current["field"] if field not in set(base["field"])]
+    print(f"{len(base)} existing rows, {len(added)} added: {', '.join(added) or '-'}")
+    if problems:
+        for problem in problems:
+            print(f"CHANGED {problem}")
+        print(f"{len(problems)} differences in existing rows")
+        sys.exit(1)
+    print("existing rows unchanged")
+
+
+if __name__ == "__main__":
+    main()
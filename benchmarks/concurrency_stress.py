@@ -0,0 +1,226 @@
+"""
+Concurrency stress test of the per-request models: threads acting as different
+users in different modes hammer get_data_list / get_alert_list at the same time
+and check that no one ever sees or changes another user's or mode's rows.
+
+Each thread is one (user, mode). Every round it takes the user from a flask
+session, either through a request context (regular callbacks) or through the
+signed session cookie in the dash callback context (background callbacks), then
+rewrites the personal_note of its tickers, reads its rows back, and deletes and
+restores a ticker through the shared trash. The tickers are the same for every
+user, so the market_data documents are shared too. Exits non-zero on any
+violation.
+
+No network is used: market_data is seeded directly. Requires a local MongoDB
+(BENCH_MONGODB_URI, default mongodb://localhost:27017); the test runs in its own
+database, concurrency_stress, which is dropped at the end.
+
+    python -m benchmarks.concurrency_stress --users 8 --tickers 20 --rounds 25
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault(
+    "MONGODB_URI", os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+)
+# the models use the holdings and market_data collections of this database, which
+# is dropped at the end
+os.environ["MONGODB_DB_NAME"] = "concurrency_stress"
+
+from benchmarks.temporary_caches import use_temporary_caches  # noqa: E402
+
+use_temporary_caches()
+
+import dash  # noqa: E402
+import flask  # noqa: E402
+from dash._callback_context import context_value  # noqa: E402
+from dash._utils import AttributeDict  # noqa: E402
+
+from models import models  # noqa: E402
+from models.database import get_db_connection  # noqa: E402
+from models.migrations import migrate_indexes  # noqa: E402
+from utils.cache_setup import cache  # noqa: E402
+from utils.enums import FreqMode  # noqa: E402
+
+USER_PREFIX = "stress_user_"
+
+
+def _seed(db, users, tickers):
+    migrate_indexes(db)
+    holdings = db["holdings"]
+    market_data = db["market_data"]
+    holdings.delete_many({})
+    market_data.delete_many({})
+    market_data.insert_many(
+        [{"ticker": ticker, "regularMarketPrice": 100.0 + i} for i, ticker in enumerate(tickers)]
+    )
+    holdings.insert_many(
+        [
+            {
+                "username": user,
+                "freq_mode": mode,
+                "ticker": ticker,
+                "personal_note": f"{user}/{mode.name}/seed",
+                "positionQuantity": 1,
+            }
+            for user in users
+            for mode in FreqMode
+            for ticker in tickers
+        ]
+    )
+    for user in users:
+        cache.delete(user)
+    return holdings, market_data
+
+
+class Stress:
+    def __init__(self, server, holdings, market_data, tickers, rounds):
+        self.server = server
+        self.holdings = holdings
+        self.market_data = market_data
+        self.tickers = tickers
+        self.rounds = rounds
+        self.violations = []
+        self._lock = threading.Lock()
+        self._serializer = server.session_interface.get_signing_serializer(server)
+        self._start = threading.Event()
+
+    def _violation(self, message):
+        with self._lock:
+            self.violations.append(message)
+
+    def _as_user(self, user, background):
+        """context manager in which current_username() is user"""
+        if not background:
+            context = self.server.test_request_context()
+            context.push()
+            flask.session["user"] = user
+            return context.pop
+
+        cookie = self._serializer.dumps({"user": user})
+        token = context_value.set(
+            AttributeDict(cookies={self.server.config["SESSION_COOKIE_NAME"]: cookie})
+        )
+        return lambda: context_value.reset(token)
+
+    def _check_rows(self, rows, user, mode, note):
+        if len(rows) != len(self.tickers):
+            self._violation(f"{user}/{mode.name}: read {len(rows)} rows")
+        for row in rows:
+            if row.get("username") != user or row.get("freq_mode") != mode:
+                self._violation(
+                    f"{user}/{mode.name}: read a row of {row.get('username')}/{row.get('freq_mode')}"
+                )
+            elif row.get("personal_note") != note:
+                self._violation(
+                    f"{user}/{mode.name}: read note {row.get('personal_note')!r}, expected {note!r}"
+                )
+
+    def run_thread(self, user, mode):
+        self._start.wait()
+        for i in range(self.rounds):
+            done = self._as_user(user, background=i % 2 == 1)
+            try:
+                dl = models.get_data_list(mode)
+                al = models.get_alert_list(mode)
+                if dl.username != user or al.username != user:
+                    self._violation(f"{user}/{mode.name}: got a model of {dl.username}")
+
+                note = f"{user}/{mode.name}/{i}"
+                for ticker in self.tickers:
+                    row = dl.update_user_input(ticker, "personal_note", note)
+                    if row["username"] != user:
+                        self._violation(f"{user}/{mode.name}: updated {row['username']}'s {ticker}")
+                self._check_rows(dl.read_all(), user, mode, note)
+
+                ticker = self.tickers[i % len(self.tickers)]
+                dl.delete(ticker)
+                row = dl.restore_latest_ticker()
+                if row["ticker"] != ticker or row["personal_note"] != note:
+                    self._violation(
+                        f"{user}/{mode.name}: deleted {ticker}, restored "
+                        f"{row['ticker']} ({row['personal_note']!r})"
+                    )
+                al.read_all()
+            except Exception as e:
+                self._violation(f"{user}/{mode.name}: {type(e).__name__}: {e}")
+            finally:
+                done()
+
+    def run(self, users, workers):
+        pairs = [(user, mode) for user in users for mode in FreqMode]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self.run_thread, *pair) for pair in pairs]
+            self._start.set()
+            for future in futures:
+                future.result()
+        return time.perf_counter() - start, len(pairs)
+
+    def check_final_state(self, users):
+        holdings = self.holdings
+        for user in users:
+            for mode in FreqMode:
+                expected = f"{user}/{mode.name}/{self.rounds - 1}"
+                n = holdings.count_documents({"username": user, "freq_mode": mode})
+                wrong = holdings.count_documents(
+                    {"username": user, "freq_mode": mode, "personal_note": {"$ne": expected}}
+                )
+                if n != len(self.tickers) or wrong:
+                    self._violation(
+                        f"{user}/{mode.name}: {n} holdings stored, {wrong} with another note"
+                    )
+            rdl = models.RawDataList(holdings, self.market_data, username=user)
+            if not all(rdl.is_all_trash_empty()):
+                self._violation(f"{user}: trash not empty at the end")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=25)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="threads (default: one per user and mode)"
+    )
+    args = parser.parse_args()
+
+    users = [f"{USER_PREFIX}{i}" for i in range(args.users)]
+    tickers = [f"T{i:04d}" for i in range(args.tickers)]
+    workers = args.workers or args.users * len(FreqMode)
+
+    server = flask.Flask(__name__)
+    server.secret_key = "stress-test"
+    # current_username() finds the server through the dash app in background callbacks
+    dash.Dash(__name__, server=server)
+
+    db = get_db_connection()
+    holdings, market_data = _seed(db, users, tickers)
+    stress = Stress(server, holdings, market_data, tickers, args.rounds)
+    elapsed, n_threads = stress.run(users, workers)
+    stress.check_final_state(users)
+
+    db.client.drop_database(db.name)
+    for user in users:
+        cache.delete(user)
+
+    n_calls = n_threads * args.rounds * (args.tickers + 3)
+    print(
+        f"{n_threads} threads x {args.rounds} rounds on {workers} workers: "
+        f"{n_calls} model calls in {elapsed:.2f}s"
+    )
+    if stress.violations:
+        for message in stress.violations[:20]:
+            print(f"VIOLATION {message}")
+        print(f"{len(stress.violations)} isolation violations")
+        sys.exit(1)
+    print("no isolation violations")
+
+
+if __name__ == "__main__":
+    main()
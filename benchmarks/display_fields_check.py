@@ -0,0 +1,167 @@
+"""
+Golden check and benchmark of the derived fields of written and refreshed rows
+(DataList._mutate_data_list_on_user): the batched float64 path is compared value
+for value, type included, with the row by row computation it replaced, on
+randomized rows mixing floats, ints, ints past 2**53, zeros, NaN, None, bools
+and strings, and on rows of floats only (stored inputs, as coerced). Exits
+non-zero on any mismatch. No network or database is needed.
+
+With --mongo the rows read through DISPLAY_STAGES (read_all) are compared with
+the batched path too, on values of the stored types. That needs a local MongoDB
+(BENCH_MONGODB_URI, default mongodb://localhost:27017) and runs in its own
+database, display_fields_check, which is dropped at the end.
+
+    python -m benchmarks.display_fields_check --rows 20000
+    python -m benchmarks.display_fields_check --rows 2000 --mongo
+"""
+
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+
+from models.models import DISPLAY_STAGES, DataList, _perc_chg, _position_cost
+
+INPUT_KEYS = (
+    "regularMarketPrice",
+    "priceUpperTarget",
+    "priceLowerTarget",
+    "averageBuyPrice",
+    "positionQuantity",
+)
+DERIVED_KEYS = (
+    "percentFromUpperTarget",
+    "percentFromLowerTarget",
+    "positionFMV",
+    "unrealizedGainLoss",
+    "positionReturn",
+)
+EDGE_VALUES = [None, 0, 0.0, -0.0, 1, -3, 7, 12.5, -0.1, float("nan"), float("inf"), 1e308]
+PYTHON_ONLY_VALUES = [2**60, -(2**53) - 1, True, "abc", "12.5"]
+DB_NAME = "display_fields_check"
+
+
+def legacy_mutate(data):
+    """the row by row computation, kept as the reference"""
+    price = data.get("regularMarketPrice")
+    quantity = data.get("positionQuantity")
+    cost = data.get("positionCost")
+    numbers = (int, float)
+    fmv = price * quantity if all(isinstance(v, numbers) for v in (price, quantity)) else None
+    data["percentFromUpperTarget"] = _perc_chg(data, "regularMarketPrice", "priceUpperTarget")
+    data["percentFromLowerTarget"] = _perc_chg(data, "regularMarketPrice", "priceLowerTarget")
+    data["positionFMV"] = fmv
+    data["unrealizedGainLoss"] = (
+        fmv - cost if all(isinstance(v, numbers) for v in (fmv, cost)) else None
+    )
+    data["positionReturn"] = _perc_chg(data, "regularMarketPrice", "averageBuyPrice")
+
+
+def random_rows(n, rng, python_only=True, floats_only=False):
+    edge_values = EDGE_VALUES + (PYTHON_ONLY_VALUES if python_only else [])
+
+    def value():
+        if floats_only:
+            # what the stored inputs look like once coerced
+            return rng.uniform(1, 1e4)
+        r = rng.random()
+        if r < 0.3:
+            return rng.choice(edge_values)
+        if r < 0.5:
+            return rng.randint(-10_000, 10_000)
+        return rng.uniform(-1e4, 1e4)
+
+    rows = []
+    for i in range(n):
+        row = {"ticker": f"T{i:06d}", **{key: value() for key in INPUT_KEYS}}
+        row["positionCost"] = _position_cost(row)
+        rows.append(row)
+    return rows
+
+
+def _signature(value):
+    # repr tells -0.0 from 0.0 and round-trips every float bit for bit
+    return type(value).__name__, repr(value)
+
+
+def compare(expected_rows, actual_rows):
+    """returns the (ticker, field, expected, actual) that differ"""
+    mismatches = []
+    for expected, actual in zip(expected_rows, actual_rows):
+        for key in DERIVED_KEYS:
+            if _signature(expected.get(key)) != _signature(actual.get(key)):
+                mismatches.append((expected["ticker"], key, expected.get(key), actual.get(key)))
+    return mismatches
+
+
+def _batched(rows):
+    rows = copy.deepcopy(rows)
+    start = time.perf_counter()
+    DataList._mutate_data_list_on_user(None, rows)
+    return rows, time.perf_counter() - start
+
+
+def _legacy(rows):
+    rows = copy.deepcopy(rows)
+    start = time.perf_counter()
+    for row in rows:
+        legacy_mutate(row)
+    return rows, time.perf_counter() - start
+
+
+def _through_pipeline(rows):
+    from pymongo import MongoClient
+
+    client = MongoClient(os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017"))
+    try:
+        collection = client[DB_NAME]["rows"]
+        collection.drop()
+        collection.insert_many([{"_id": i, **row} for i, row in enumerate(rows)])
+        pipeline = [{"$sort": {"_id": 1}}, {"$project": {"_id": 0}}, *DISPLAY_STAGES]
+        return list(collection.aggregate(pipeline))
+    finally:
+        client.drop_database(DB_NAME)
+        client.close()
+
+
+def _report(name, mismatches):
+    for ticker, key, expected, actual in mismatches[:10]:
+        print(f"MISMATCH {name} {ticker} {key}: expected {expected!r}, got {actual!r}")
+    print(f"{name}: {len(mismatches)} mismatches")
+    return len(mismatches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mongo", action="store_true", help="also compare DISPLAY_STAGES")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failed = 0
+    for name, floats_only in (("mixed", False), ("floats", True)):
+        rows = random_rows(args.rows, rng, floats_only=floats_only)
+        legacy_rows, legacy_time = _legacy(rows)
+        batched_rows, batched_time = _batched(rows)
+        print(
+            f"{name:<7} {args.rows} rows: row by row {legacy_time:.4f}s, "
+            f"batched {batched_time:.4f}s ({legacy_time / batched_time:.1f}x)"
+        )
+        failed += _report(f"{name} batched vs row by row", compare(legacy_rows, batched_rows))
+
+    if args.mongo:
+        rows = random_rows(args.rows, rng, python_only=False)
+        batched_rows, _ = _batched(rows)
+        failed += _report(
+            "DISPLAY_STAGES vs batched", compare(batched_rows, _through_pipeline(rows))
+        )
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Golden check and benchmark of the period window computation of _query_5y_one_ticker.
+
+The PriceWindowIndex output for the 1D/1W/1M/1Y/5Y windows is compared value
+for value with the pandas implementation it replaced, on synthetic 5y series
+across several exchange timezones, with missing bars and an after-hours latest
+bar. Exits non-zero on any mismatch. No network or database is needed.
+
+    python -m benchmarks.period_windows_benchmark --tickers 200
+"""
+
+import argparse
+import math
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.stand_in_server import synthetic_chart_payload
+from models.period_windows import PriceWindowIndex, PERIOD_OFFSETS
+
+TIMEZONES = [
+    "America/New_York",
+    "Europe/Amsterdam",
+    "Asia/Tokyo",
+    "Australia/Sydney",
+    "UTC",
+]
+
+
+def legacy_period_stats(timestamps, price, low, high, closing_time_offset, tz_name):
+    """the DataFrame based implementation, kept as the reference"""
+    df = pd.DataFrame({"date": timestamps, "price": price, "low": low, "high": high})
+    df.at[df.index[-1], "date"] = df.at[df.index[-1], "date"] - closing_time_offset
+    df["date"] = (
+        pd.to_datetime(df["date"] + closing_time_offset, unit="s", utc=True)
+        .dt.tz_convert(tz_name)
+        .dt.tz_localize(None)
+    )
+
+    t2 = df.iloc[-2]["date"]
+    t1 = df.iloc[-1]["date"]
+    if t1.time() > t2.time():
+        df.at[df.index[-1], "date"] = pd.Timestamp.combine(t1.date(), t2.time())
+
+    date_prefix_map = {
+        "1D": pd.DateOffset(days=1),
+        "1W": pd.DateOffset(weeks=1),
+        "1M": pd.DateOffset(months=1),
+        "1Y": pd.DateOffset(years=1),
+        "5Y": pd.DateOffset(years=5),
+    }
+    latest_date = df.iloc[-1]["date"]
+    first_date = df.iloc[0]["date"]
+
+    stats = {}
+    for label, offset in date_prefix_map.items():
+        prior_date = first_date if label == "5Y" else latest_date - offset
+        period_df = df[df["date"] >= prior_date] if first_date <= prior_date else pd.DataFrame()
+        if period_df.empty:
+            stats[label] = (None, None, None)
+        else:
+            stats[label] = (
+                float(period_df.iloc[0]["price"]),
+                float(period_df["low"].min()),
+                float(period_df["high"].max()),
+            )
+    return stats
+
+
+# the windows the pandas implementation computed
+LEGACY_LABELS = ["1D", "1W", "1M", "1Y", "5Y"]
+
+
+def index_period_stats(timestamps, price, low, high, closing_time_offset, tz_name):
+    """all configured windows, from one PriceWindowIndex"""
+    index = PriceWindowIndex.from_chart(
+        timestamps, price, low, high, closing_time_offset, tz_name
+    )
+    return {
+        label: index.window_stats(index.window_start(offset))
+        for label, offset in PERIOD_OFFSETS.items()
+    }
+
+
+def _same(a, b):
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b and type(a) is type(b)
+
+
+def _cases(n_tickers):
+    for i in range(n_tickers):
+        base = synthetic_chart_payload(f"T{i:05d}", n_bars=1260 if i % 4 else 200)
+        base = base["chart"]["result"][0]
+        regular = base["meta"]["currentTradingPeriod"]["regular"]
+        quote = base["indicators"]["quote"][0]
+        timestamps = list(base["timestamp"])
+        price = list(base["indicators"]["adjclose"][0]["adjclose"])
+        low, high = list(quote["low"]), list(quote["high"])
+
+        if i % 3 == 0:
+            # missing values inside the series
+            price[-30] = low[-3] = high[-200] = None
+        if i % 5 == 0:
+            # after-hours latest bar
+            timestamps[-1] += 3 * 60 * 60
+
+        yield (
+            timestamps,
+            price,
+            low,
+            high,
+            regular["end"] - regular["start"],
+            TIMEZONES[i % len(TIMEZONES)],
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=200)
+    args = parser.parse_args()
+
+    cases = list(_cases(args.tickers))
+
+    start = time.perf_counter()
+    legacy = [legacy_period_stats(*case) for case in cases]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [index_period_stats(*case) for case in cases]
+    index_time = time.perf_counter() - start
+
+    mismatches = 0
+    for case, expected, actual in zip(cases, legacy, indexed):
+        for label in LEGACY_LABELS:
+            if not all(_same(a, b) for a, b in zip(expected[label], actual[label])):
+                mismatches += 1
+                print(f"MISMATCH {case[5]} {label}: {expected[label]} != {actual[label]}")
+
+    print(f"tickers={args.tickers}")
+    print(f"pandas:         {legacy_time:8.3f}s ({len(LEGACY_LABELS)} windows)")
+    print(f"window index:   {index_time:8.3f}s ({len(PERIOD_OFFSETS)} windows)")
+    print(f"speedup:        {legacy_time / index_time:8.2f}x")
+    print(f"mismatches:     {mismatches}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark _query_5y_one_ticker with a full 5y backfill vs an incremental refresh
+merged into the local price history, against the local stand-in server.
+
+Runs against the stand-in HTTP server only; no network or database is needed.
+The RawDataList is built on collections it never queries, and the MongoDB client
+does not connect until a command is sent.
+
+    python -m benchmarks.price_history_benchmark --tickers 100
+"""
+
+import argparse
+import os
+import time
+
+os.environ.setdefault(
+    "MONGODB_URI", os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+)
+
+from benchmarks.temporary_caches import use_temporary_caches  # noqa: E402
+
+use_temporary_caches()
+
+from benchmarks.stand_in_server import StandInServer  # noqa: E402
+from models import models  # noqa: E402
+from models.database import get_db_connection  # noqa: E402
+from utils.cache_setup import market_data_cache, price_history_cache  # noqa: E402
+from utils.enums import FreqMode  # noqa: E402
+from utils.rate_limiter import RateLimiter  # noqa: E402
+
+
+def _run(rdl, server, tickers):
+    bytes_before = server.bytes_sent
+    start = time.perf_counter()
+    outputs = [rdl._query_5y_one_ticker(ticker) for ticker in tickers]
+    return time.perf_counter() - start, server.bytes_sent - bytes_before, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=100)
+    args = parser.parse_args()
+
+    tickers = [f"T{i:05d}" for i in range(args.tickers)]
+    db = get_db_connection()
+    rdl = models.RawDataList(
+        db["bench_holdings"], db["bench_market_data"], FreqMode.DAILY
+    )
+
+    # the stand-in server does not throttle, so neither does the client
+    models.chart_rate_limiter = RateLimiter(market_data_cache, "benchmark", rate=0)
+
+    with StandInServer() as server:
+        models.YAHOO_BASE_URL = server.url
+        for ticker in tickers:
+            price_history_cache.delete(ticker)
+
+        full_time, full_bytes, full_outputs = _run(rdl, server, tickers)
+        incr_time, incr_bytes, incr_outputs = _run(rdl, server, tickers)
+
+    print(f"tickers={args.tickers}")
+    print(f"full 5y:     {full_time:8.3f}s {full_bytes / 1024:10.1f} KiB")
+    print(f"incremental: {incr_time:8.3f}s {incr_bytes / 1024:10.1f} KiB")
+    print(f"payload reduction: {full_bytes / incr_bytes:6.1f}x")
+    print(f"identical:         {full_outputs == incr_outputs}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+Query-plan regression check of the model layer: every RawDataList / AlertList
+method (and DataList.read_all) is run against a seeded MongoDB, and each
+command it sends is explained with executionStats. A plan fails if it contains
+a COLLSCAN or examines far more documents than it returns, so an index that a
+query relies on cannot be dropped or bypassed unnoticed.
+
+Commands are captured with a pymongo CommandListener. The database is seeded
+again before they are explained, so writes are planned against the data they
+met (explaining a write does not apply it). Chart fetches are stubbed; no
+network is used.
+
+docsExamined / keysExamined of every command are written to JSON, by default
+benchmarks/results/query_plans/<commit>.json; --compare prints what changed
+since an earlier result file.
+
+Requires a local MongoDB (BENCH_MONGODB_URI, default mongodb://localhost:27017);
+the check runs in its own database, query_plans, which is dropped at the end.
+
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --compare benchmarks/results/query_plans/<older commit>.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.temporary_caches import use_temporary_caches
+
+use_temporary_caches()
+
+from bson import ObjectId  # noqa: E402
+from pymongo import MongoClient, monitoring  # noqa: E402
+
+from benchmarks.suite import _git_commit  # noqa: E402
+from models import models  # noqa: E402
+from models.migrations import migrate_indexes  # noqa: E402
+from utils.cache_setup import cache  # noqa: E402
+from utils.enums import FreqMode  # noqa: E402
+
+RESULTS_DIR = Path(__file__).parent / "results" / "query_plans"
+DB_NAME = "query_plans"
+USERNAME = "plan_user_0"
+
+# commands with a query plan
+EXPLAINABLE = {"find", "aggregate", "distinct", "update", "delete", "findAndModify"}
+# command fields that explain does not take (session, api version, cluster time)
+_SESSION_FIELDS = {"lsid", "txnNumber", "writeConcern", "readConcern", "apiVersion"}
+# per write command, this many of its statements are explained
+MAX_STATEMENTS = 3
+
+
+class CommandRecorder(monitoring.CommandListener):
+    def __init__(self):
+        self.recording = False
+        self.commands = []
+
+    def started(self, event):
+        if self.recording and event.command_name in EXPLAINABLE:
+            self.commands.append(
+                {
+                    key: value
+                    for key, value in event.command.items()
+                    if key not in _SESSION_FIELDS and not key.startswith("$")
+                }
+            )
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def _explainable(command):
+    """splits a multi-statement write into one command per statement"""
+    for statements in ("updates", "deletes"):
+        if statements in command:
+            return [
+                {**command, statements: [statement]}
+                for statement in command[statements][:MAX_STATEMENTS]
+            ]
+    return [command]
+
+
+def _summarize(explain):
+    """plan stages, documents and keys examined, and documents returned / written"""
+    summary = {"stages": set(), "docs_examined": 0, "keys_examined": 0, "returned": 0}
+
+    def walk(node):
+        if isinstance(node, list):
+            for item in node:
+                walk(item)
+            return
+        if not isinstance(node, dict):
+            return
+        if "stage" in node:
+            summary["stages"].add(node["stage"])
+        stats = node.get("executionStats")
+        if isinstance(stats, dict):
+            summary["docs_examined"] += stats.get("totalDocsExamined", 0)
+            summary["keys_examined"] += stats.get("totalKeysExamined", 0)
+            # what the plan as a whole returns, or writes; not what its inner
+            # stages pass on
+            root = stats.get("executionStages", {})
+            summary["returned"] = max(
+                summary["returned"],
+                stats.get("nReturned", 0),
+                *(root.get(key, 0) for key in ("nMatched", "nWouldModify", "nWouldDelete")),
+            )
+        if "$lookup" in node and "totalDocsExamined" in node:
+            summary["docs_examined"] += node["totalDocsExamined"]
+            summary["keys_examined"] += node.get("totalKeysExamined", 0)
+            if node.get("collectionScans"):
+                summary["stages"].add("COLLSCAN")
+        for key, value in node.items():
+            if key != "rejectedPlans":
+                walk(value)
+
+    walk(explain)
+    summary["stages"] = sorted(summary["stages"])
+    return summary
+
+
+class Seed:
+    """a few users' portfolios in every mode, with alerts; reloaded before each case"""
+
+    def __init__(self, db, n_users, n_tickers):
+        self.db = db
+        self.users = [f"plan_user_{i}" for i in range(n_users)]
+        now = int(time.time())
+        tickers_per_mode = {
+            mode: [f"T{i + n_tickers * k:04d}" for i in range(n_tickers)]
+            for k, mode in enumerate(FreqMode)
+        }
+        self.tickers = tickers_per_mode
+        self.documents = {
+            "market_data": [
+                {"ticker": ticker, "regularMarketPrice": 10.0 + i % 50, "fetchedAt": now}
+                for i, ticker in enumerate(t for ts in tickers_per_mode.values() for t in ts)
+            ],
+            "holdings": [
+                {
+                    "username": user,
+                    "freq_mode": mode,
+                    "ticker": ticker,
+                    "priority": 1,
+                    "positionQuantity": 10,
+                    "averageBuyPrice": 12.0,
+                    "positionCost": 120.0,
+                }
+                for user in self.users
+                for mode, tickers in tickers_per_mode.items()
+                for ticker in tickers
+            ],
+            "alert_data": [
+                {
+                    "_id": ObjectId(),
+                    "username": user,
+                    "ticker": ticker,
+                    "freq_mode": mode,
+                    "created_time": datetime.now(timezone.utc),
+                    "alert_description": "",
+                    "lower_alert_price": 5.0,
+                    "upper_alert_price": 50.0,
+                    # half of them triggered long ago
+                    "triggered_date": datetime.now(timezone.utc) if i % 2 else None,
+                }
+                for user in self.users
+                for mode, tickers in tickers_per_mode.items()
+                for i, ticker in enumerate(tickers[: n_tickers // 2])
+            ],
+        }
+
+    def load(self):
+        for name, documents in self.documents.items():
+            self.db[name].delete_many({})
+            self.db[name].insert_many([dict(document) for document in documents])
+        for user in self.users:
+            cache.delete(user)
+
+    def alert_ids(self, user, n):
+        return [
+            alert["_id"]
+            for alert in self.documents["alert_data"]
+            if alert["username"] == user and alert["freq_mode"] == FreqMode.DAILY
+        ][:n]
+
+
+def _cases(db, seed):
+    """(name, setup, run, check_ratio) of every model method"""
+    rdl = models.RawDataList(db["holdings"], db["market_data"], FreqMode.DAILY, USERNAME)
+    dl = models.DataList(db["holdings"], db["market_data"], FreqMode.DAILY, USERNAME)
+    al = models.AlertList(db["alert_data"], FreqMode.DAILY, USERNAME)
+
+    def raw_output(ticker):
+        return {"regularMarketPrice": 11.0, "fetchedAt": int(time.time())}
+
+    # the chart API is never called
+    rdl._query_one_ticker = raw_output
+    dl.rdl._query_one_ticker = raw_output
+
+    daily, weekly = seed.tickers[FreqMode.DAILY], seed.tickers[FreqMode.WEEKLY]
+    return [
+        ("RawDataList.read_all", None, rdl.read_all, True),
+        ("DataList.read_all", None, dl.read_all, True),
+        ("RawDataList.is_duplicate", None, lambda: rdl.is_duplicate(weekly[0]), True),
+        ("RawDataList.append", None, lambda: rdl.append({"ticker": "NEW1"}), True),
+        ("RawDataList.delete", None, lambda: rdl.delete(daily[0]), True),
+        ("RawDataList.restore", lambda: rdl.delete(daily[1]), rdl.restore, True),
+        (
+            "RawDataList.update_user_input",
+            None,
+            lambda: rdl.update_user_input(daily[2], "positionQuantity", 20),
+            True,
+        ),
+        ("RawDataList.update_alert_count", None, lambda: rdl.update_alert_count(daily[3], 2), True),
+        ("RawDataList.refresh_raw_output", None, lambda: rdl.refresh_raw_output(daily[4]), True),
+        ("RawDataList.iter_refresh", None, lambda: list(rdl.iter_refresh(max_workers=1)), True),
+        # stale rows are picked on the joined market data, after the index lookup;
+        # the seed is fresh, so nothing is returned
+        (
+            "RawDataList.iter_refresh(stale_only)",
+            None,
+            lambda: list(rdl.iter_refresh(max_workers=1, stale_only=True)),
+            False,
+        ),
+        ("AlertList.read", None, lambda: al.read(daily[0]), True),
+        ("AlertList.read_all", None, al.read_all, True),
+        ("AlertList.read_untriggered", None, al.read_untriggered, True),
+        ("AlertList.read_tickers", None, al.read_tickers, True),
+        ("AlertList.append", None, lambda: al.append(daily[5], "", 1.0, "", 2.0, ""), True),
+        (
+            "AlertList.delete_one_alert",
+            None,
+            lambda: al.delete_one_alert(str(seed.alert_ids(USERNAME, 1)[0])),
+            True,
+        ),
+        (
+            "AlertList.update_triggered_date",
+            None,
+            lambda: al.update_triggered_date(seed.alert_ids(USERNAME, 3)),
+            True,
+        ),
+        (
+            "AlertList.delete_orphaned_tickers",
+            None,
+            lambda: al.delete_orphaned_tickers(daily[:2]),
+            True,
+        ),
+        ("AlertList.delete_other_alerts", None, lambda: al.delete_other_alerts(USERNAME), True),
+    ]
+
+
+def run(db, recorder, seed, max_ratio, slack):
+    results = []
+    for name, setup, method, check_ratio in _cases(db, seed):
+        seed.load()
+        if setup:
+            setup()
+        recorder.commands = []
+        recorder.recording = True
+        try:
+            method()
+        finally:
+            recorder.recording = False
+        commands = [c for command in recorder.commands for c in _explainable(command)]
+
+        # explained against the data the method ran on
+        seed.load()
+        for command in commands:
+            command_name = next(iter(command))
+            explain = db.command({"explain": command, "verbosity": "executionStats"})
+            summary = _summarize(explain)
+            problems = []
+            if "COLLSCAN" in summary["stages"]:
+                problems.append("COLLSCAN")
+            examined = max(summary["docs_examined"], summary["keys_examined"])
+            if check_ratio and examined > max_ratio * summary["returned"] + slack:
+                problems.append(f"examined {examined} for {summary['returned']}")
+            results.append(
+                {
+                    "case": name,
+                    "command": command_name,
+                    "collection": command[command_name],
+                    **summary,
+                    "problems": problems,
+                }
+            )
+            flag = "FAIL " + ", ".join(problems) if problems else "ok"
+            print(
+                f"{name:<40} {command_name:<14} {command[command_name]:<12} "
+                f"docs {summary['docs_examined']:>6} keys {summary['keys_examined']:>6} "
+                f"returned {summary['returned']:>6}  {'+'.join(summary['stages']):<40} {flag}"
+            )
+    return results
+
+
+def _compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {}
+    for result in baseline["results"]:
+        previous.setdefault((result["case"], result["command"], result["collection"]), result)
+
+    print(f"\ncompared with {baseline['commit']} ({baseline_path})")
+    seen = set()
+    for result in results:
+        key = (result["case"], result["command"], result["collection"])
+        if key in seen:
+            continue
+        seen.add(key)
+        before = previous.get(key)
+        if before is None:
+            print(f"{' / '.join(key):<70} new")
+            continue
+        for field in ("docs_examined", "keys_examined"):
+            if result[field] != before[field]:
+                print(f"{' / '.join(key):<70} {field} {before[field]} -> {result[field]}")
+        if result["stages"] != before["stages"]:
+            print(
+                f"{' / '.join(key):<70} plan {'+'.join(before['stages'])} -> "
+                f"{'+'.join(result['stages'])}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--tickers", type=int, default=40, help="tickers per user and mode")
+    parser.add_argument(
+        "--max-ratio", type=float, default=3, help="documents or keys examined per returned"
+    )
+    parser.add_argument("--slack", type=int, default=10, help="examined always allowed")
+    parser.add_argument(
+        "--out", default=None, help="result file (default: results/query_plans/<commit>.json)"
+    )
+    parser.add_argument("--compare", default=None, help="earlier result file")
+    args = parser.parse_args()
+
+    recorder = CommandRecorder()
+    client = MongoClient(
+        os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017"), event_listeners=[recorder]
+    )
+    db = client[DB_NAME]
+    client.drop_database(DB_NAME)
+    migrate_indexes(db)
+    seed = Seed(db, args.users, args.tickers)
+
+    try:
+        results = run(db, recorder, seed, args.max_ratio, args.slack)
+    finally:
+        client.drop_database(DB_NAME)
+        for user in seed.users:
+            cache.delete(user)
+
+    commit, dirty = _git_commit()
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{commit}{'-dirty' if dirty else ''}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(
+            {
+                "commit": commit,
+                "dirty": dirty,
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "server_version": client.server_info()["version"],
+                "users": args.users,
+                "tickers": args.tickers,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"results written to {out}")
+
+    if args.compare:
+        _compare(results, args.compare)
+
+    failures = [result for result in results if result["problems"]]
+    if failures:
+        print(f"{len(failures)} of {len(results)} plans failed")
+        sys.exit(1)
+    print(f"all {len(results)} plans use an index")
+
+
+if __name__ == "__main__":
+    main()
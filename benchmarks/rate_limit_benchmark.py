@@ -0,0 +1,105 @@
+"""
+Refresh tickers against a stand-in server that throttles at --rate requests per
+second (429 + Retry-After above it), first without a client rate limit, then
+with chart_rate_limiter set to the server's ceiling. Exits non-zero if the
+limited run has failed tickers or its throughput falls below 90% of the ceiling.
+
+Requires a local MongoDB (BENCH_MONGODB_URI, default mongodb://localhost:27017).
+
+    python -m benchmarks.rate_limit_benchmark --tickers 200 --rate 20 --workers 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault(
+    "MONGODB_URI", os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+)
+
+from benchmarks.temporary_caches import use_temporary_caches  # noqa: E402
+
+use_temporary_caches()
+
+from benchmarks.stand_in_server import StandInServer  # noqa: E402
+from models import models  # noqa: E402
+from models.database import get_db_connection  # noqa: E402
+from utils.cache_setup import market_data_cache, price_history_cache  # noqa: E402
+from utils.enums import FreqMode  # noqa: E402
+from utils.http_client import get_http_stats, reset_http_stats  # noqa: E402
+from utils.rate_limiter import RateLimiter  # noqa: E402
+
+
+def _run(rdl, tickers, rate, burst, workers, latency):
+    with StandInServer(latency=latency, rate_limit=rate, burst=burst) as server:
+        models.YAHOO_BASE_URL = server.url
+        market_data_cache.clear()
+        reset_http_stats()
+
+        start = time.perf_counter()
+        results = rdl._query_many_tickers(tickers, max_workers=workers)
+        elapsed = time.perf_counter() - start
+
+        failed = sum(isinstance(result, Exception) for result in results)
+        served = server.request_count
+        stats = get_http_stats()
+        limiter_stats = models.chart_rate_limiter.get_stats()
+
+    return {
+        "elapsed": elapsed,
+        "failed": failed,
+        "throughput": served / elapsed,
+        "throttled": stats["throttled"],
+        "retries": stats["retries"],
+        "max_wait": limiter_stats["max_wait"],
+        "total_wait": limiter_stats["total_wait"],
+    }
+
+
+def _print(name, run):
+    print(
+        f"{name:<12} {run['elapsed']:7.2f}s {run['throughput']:6.1f} req/s "
+        f"429s={run['throttled']:<5} retries={run['retries']:<5} failed={run['failed']:<5} "
+        f"limiter wait total={run['total_wait']:.1f}s max={run['max_wait']:.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=20)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    tickers = [f"T{i:05d}" for i in range(args.tickers)]
+    db = get_db_connection()
+    rdl = models.RawDataList(
+        db["bench_holdings"], db["bench_market_data"], FreqMode.DAILY
+    )
+    for ticker in tickers:
+        price_history_cache.delete(ticker)
+
+    models.chart_rate_limiter = RateLimiter(market_data_cache, "benchmark", rate=0)
+    unlimited = _run(rdl, tickers, args.rate, args.burst, args.workers, args.latency)
+
+    for ticker in tickers:
+        price_history_cache.delete(ticker)
+    models.chart_rate_limiter = RateLimiter(
+        market_data_cache, "benchmark", rate=args.rate, burst=args.burst
+    )
+    limited = _run(rdl, tickers, args.rate, args.burst, args.workers, args.latency)
+
+    print(f"tickers={args.tickers} server ceiling={args.rate} req/s burst={args.burst} workers={args.workers}")
+    _print("no limiter", unlimited)
+    _print("limiter", limited)
+
+    ok = limited["failed"] == 0 and limited["throughput"] >= 0.9 * args.rate
+    print(f"limited run at ceiling without errors: {ok}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
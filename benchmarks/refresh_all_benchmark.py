@@ -0,0 +1,100 @@
+"""
+Benchmark RawDataList.refresh_all serial vs concurrent against the local stand-in server.
+
+Requires a local MongoDB (BENCH_MONGODB_URI, default mongodb://localhost:27017).
+
+    python -m benchmarks.refresh_all_benchmark --tickers 150 --latency 0.2 --workers 8
+"""
+
+import argparse
+import os
+import time
+
+os.environ.setdefault(
+    "MONGODB_URI", os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+)
+
+from benchmarks.temporary_caches import use_temporary_caches  # noqa: E402
+
+use_temporary_caches()
+
+from benchmarks.stand_in_server import StandInServer  # noqa: E402
+from models import models  # noqa: E402
+from models.database import get_db_connection  # noqa: E402
+from models.migrations import migrate_indexes  # noqa: E402
+from utils.cache_setup import market_data_cache  # noqa: E402
+from utils.enums import FreqMode  # noqa: E402
+from utils.http_client import get_http_stats, reset_http_stats  # noqa: E402
+from utils.rate_limiter import RateLimiter  # noqa: E402
+
+BENCH_USERNAME = "benchmark_user"
+
+
+def _seed(rdl, n_tickers):
+    rdl.collection.delete_many({"username": BENCH_USERNAME})
+    rdl.collection.insert_many(
+        [
+            {"username": BENCH_USERNAME, "freq_mode": FreqMode.DAILY, "ticker": f"T{i:05d}"}
+            for i in range(n_tickers)
+        ]
+    )
+
+
+def _time_refresh(rdl, max_workers):
+    # every run must go to the network, not to the shared market data cache
+    market_data_cache.clear()
+    reset_http_stats()
+    start = time.perf_counter()
+    data_list = rdl.refresh_all(max_workers=max_workers)
+    return time.perf_counter() - start, data_list, get_http_stats()
+
+
+def _format_stats(stats):
+    return (
+        f"{stats['requests']} requests, {stats['new_connections']} handshakes, "
+        f"{stats['reused_connections']} reused"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=150)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    db = get_db_connection()
+    migrate_indexes(db, prefix="bench_")
+    collection = db["bench_holdings"]
+    rdl = models.RawDataList(
+        collection, db["bench_market_data"], FreqMode.DAILY, BENCH_USERNAME
+    )
+
+    # the stand-in server does not throttle, so neither does the client
+    models.chart_rate_limiter = RateLimiter(market_data_cache, "benchmark", rate=0)
+
+    with StandInServer(latency=args.latency) as server:
+        models.YAHOO_BASE_URL = server.url
+
+        _seed(rdl, args.tickers)
+        serial_time, serial_list, serial_stats = _time_refresh(rdl, max_workers=1)
+
+        _seed(rdl, args.tickers)
+        concurrent_time, concurrent_list, concurrent_stats = _time_refresh(
+            rdl, max_workers=args.workers
+        )
+
+    collection.delete_many({"username": BENCH_USERNAME})
+
+    print(f"tickers={args.tickers} latency={args.latency}s")
+    print(f"serial:     {serial_time:8.3f}s  [{_format_stats(serial_stats)}]")
+    print(
+        f"concurrent: {concurrent_time:8.3f}s  [{_format_stats(concurrent_stats)}] "
+        f"(workers={args.workers})"
+    )
+    print(f"speedup:    {serial_time / concurrent_time:8.2f}x")
+    print(f"identical:  {serial_list == concurrent_list}")
+
+
+if __name__ == "__main__":
+    main()
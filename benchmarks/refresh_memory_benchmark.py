@@ -0,0 +1,105 @@
+"""
+Peak Python memory of refreshing a very large watchlist: collecting
+RawDataList.refresh_all into a list vs consuming RawDataList.iter_refresh row by
+row, against the local stand-in server. Peak memory is traced with tracemalloc
+after a warm-up pass that fills the local price history.
+
+Requires a local MongoDB (BENCH_MONGODB_URI, default mongodb://localhost:27017).
+
+    python -m benchmarks.refresh_memory_benchmark --tickers 5000 --batch-size 100
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault(
+    "MONGODB_URI", os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+)
+
+from benchmarks.temporary_caches import use_temporary_caches  # noqa: E402
+
+use_temporary_caches()
+
+from benchmarks.stand_in_server import StandInServer  # noqa: E402
+from models import models  # noqa: E402
+from models.database import get_db_connection  # noqa: E402
+from models.migrations import migrate_indexes  # noqa: E402
+from utils.cache_setup import market_data_cache  # noqa: E402
+from utils.enums import FreqMode  # noqa: E402
+from utils.rate_limiter import RateLimiter  # noqa: E402
+
+BENCH_USERNAME = "benchmark_user"
+
+
+def _seed(rdl, n_tickers):
+    rdl.collection.delete_many({"username": BENCH_USERNAME})
+    rdl.collection.insert_many(
+        [
+            {"username": BENCH_USERNAME, "freq_mode": FreqMode.DAILY, "ticker": f"T{i:05d}"}
+            for i in range(n_tickers)
+        ]
+    )
+
+
+def _collect(rdl, batch_size):
+    return len(rdl.refresh_all(batch_size=batch_size))
+
+
+def _stream(rdl, batch_size):
+    n_rows = 0
+    for _ in rdl.iter_refresh(batch_size=batch_size):
+        n_rows += 1
+    return n_rows
+
+
+def _trace(run, rdl, batch_size):
+    # every run must go to the network, not to the shared market data cache
+    market_data_cache.clear()
+    tracemalloc.start()
+    start = time.perf_counter()
+    n_rows = run(rdl, batch_size)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, n_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    db = get_db_connection()
+    migrate_indexes(db, prefix="bench_")
+    collection = db["bench_holdings"]
+    rdl = models.RawDataList(
+        collection, db["bench_market_data"], FreqMode.DAILY, BENCH_USERNAME
+    )
+
+    # the stand-in server does not throttle, so neither does the client
+    models.chart_rate_limiter = RateLimiter(market_data_cache, "benchmark", rate=0)
+
+    with StandInServer() as server:
+        models.YAHOO_BASE_URL = server.url
+        _seed(rdl, args.tickers)
+
+        # warm-up: 5y backfill of every ticker, so both runs are incremental
+        market_data_cache.clear()
+        _stream(rdl, args.batch_size)
+
+        collect_time, collect_peak, collect_rows = _trace(_collect, rdl, args.batch_size)
+        stream_time, stream_peak, stream_rows = _trace(_stream, rdl, args.batch_size)
+
+    collection.delete_many({"username": BENCH_USERNAME})
+
+    print(f"tickers={args.tickers} batch_size={args.batch_size}")
+    print(f"refresh_all (list): {collect_time:8.2f}s peak {collect_peak / 2**20:8.1f} MiB ({collect_rows} rows)")
+    print(f"iter_refresh:       {stream_time:8.2f}s peak {stream_peak / 2**20:8.1f} MiB ({stream_rows} rows)")
+    print(f"peak reduction:     {collect_peak / stream_peak:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Several workers (forked processes, like gunicorn workers) each run several
+concurrent refreshes of the same tickers against the local stand-in server, with
+an empty market data cache. Shows how many chart requests reached the server and
+how many fetches chart_single_flight coalesced.
+
+Requires a local MongoDB (BENCH_MONGODB_URI, default mongodb://localhost:27017).
+
+    python -m benchmarks.single_flight_benchmark --tickers 20 --workers 3 --callers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault(
+    "MONGODB_URI", os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+)
+
+from benchmarks.temporary_caches import use_temporary_caches  # noqa: E402
+
+use_temporary_caches()
+
+from benchmarks.stand_in_server import StandInServer  # noqa: E402
+from models import models  # noqa: E402
+from models.database import get_db_connection  # noqa: E402
+from utils.cache_setup import market_data_cache  # noqa: E402
+from utils.enums import FreqMode  # noqa: E402
+
+
+def _worker(rdl, tickers, n_callers, results):
+    """one worker process: n_callers threads refresh every ticker at once"""
+    with ThreadPoolExecutor(max_workers=n_callers) as executor:
+        outputs = list(
+            executor.map(lambda _: rdl._query_many_tickers(tickers), range(n_callers))
+        )
+    failed = sum(isinstance(o, Exception) for output in outputs for o in output)
+    results.put((models.chart_single_flight.get_stats(), failed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--callers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    tickers = [f"T{i:05d}" for i in range(args.tickers)]
+    db = get_db_connection()
+    rdl = models.RawDataList(
+        db["bench_holdings"], db["bench_market_data"], FreqMode.DAILY
+    )
+
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    with StandInServer(latency=args.latency) as server:
+        models.YAHOO_BASE_URL = server.url
+        market_data_cache.clear()
+
+        start = time.perf_counter()
+        workers = [
+            ctx.Process(target=_worker, args=(rdl, tickers, args.callers, results))
+            for _ in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        worker_results = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        requests = server.request_count
+
+    totals = {}
+    for stats, _ in worker_results:
+        for key, value in stats.items():
+            totals[key] = totals.get(key, 0) + value
+    failed = sum(failed for _, failed in worker_results)
+
+    print(f"tickers={args.tickers} workers={args.workers} callers/worker={args.callers}")
+    print(f"ticker refreshes requested: {args.tickers * args.workers * args.callers}")
+    print(f"chart requests to server:   {requests}")
+    print(f"fetches:                    {totals['fetches']}")
+    print(f"coalesced in a worker:      {totals['coalesced']}")
+    print(f"coalesced across workers:   {totals['coalesced_across_workers']}")
+    print(f"failed:                     {failed}")
+    print(f"elapsed:                    {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,543 @@
+"""
+Local record/replay stand-in for the Yahoo Finance chart and search endpoints.
+
+It answers
+    GET <url>/<any path>/<ticker>?range=<range>&interval=1d   (chart)
+    GET <url>/search?q=<query>                                (search)
+after an optional artificial latency, so that fetch, parse and cron benchmarks
+run offline and reproducibly. Responses come from, in order:
+    (1) recorded fixtures in fixtures_dir (chart/<ticker>.json.gz, search/<query>.json.gz);
+        a recorded chart is cut down to the requested range and shifted by whole
+        weeks so that its last bar falls in the current week
+    (2) the upstream API when record is on; the response is saved as a fixture
+    (3) a synthetic but well-formed payload (unless synthetic=False: 404)
+Given a rate_limit it throttles like the real provider: requests over the limit
+get a 429 with a Retry-After header. Given an error_rate, that fraction of
+requests (drawn from a seeded generator) gets a 500.
+
+The app targets it by configuration:
+
+    python -m benchmarks.stand_in_server serve --port 8010 --fixtures data/fixtures
+    YAHOO_BASE_URL=http://127.0.0.1:8010 YAHOO_SEARCH_URL=http://127.0.0.1:8010/search?q= python app.py
+
+Record fixtures from the live API (YAHOO_BASE_URL / YAHOO_SEARCH_URL in the
+environment of the server), or generate synthetic ones for thousands of tickers:
+
+    python -m benchmarks.stand_in_server serve --fixtures data/fixtures --record
+    python -m benchmarks.stand_in_server generate --fixtures data/fixtures --tickers 5000
+"""
+
+import argparse
+import gzip
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs, quote, unquote
+
+import requests
+
+from utils.reference import YAHOO_BASE_URL, YAHOO_SEARCH_URL
+
+DAY = 24 * 60 * 60
+WEEK = 7 * DAY
+
+# approximate number of daily bars returned for each range query parameter
+RANGE_BARS = {
+    "1d": 1,
+    "5d": 5,
+    "1mo": 21,
+    "3mo": 63,
+    "6mo": 126,
+    "1y": 252,
+    "2y": 504,
+    "5y": 1260,
+}
+
+# meta fields and regular session (UTC offsets from midnight) of the synthetic
+# payloads, picked by ticker: "-USD" crypto trades every day around the clock,
+# ".L" on the London Stock Exchange, everything else on Nasdaq
+EXCHANGE_PROFILES = {
+    "crypto": {
+        "meta": {
+            "currency": "USD",
+            "exchangeName": "CCC",
+            "fullExchangeName": "CCC",
+            "instrumentType": "CRYPTOCURRENCY",
+            "timezone": "UTC",
+            "gmtoffset": 0,
+            "exchangeTimezoneName": "UTC",
+        },
+        "open": 0,
+        "close": DAY - 60,
+        "weekdays_only": False,
+    },
+    "london": {
+        "meta": {
+            "currency": "GBp",
+            "exchangeName": "LSE",
+            "fullExchangeName": "LSE",
+            "instrumentType": "EQUITY",
+            "timezone": "BST",
+            "gmtoffset": 3600,
+            "exchangeTimezoneName": "Europe/London",
+        },
+        "open": 7 * 60 * 60,
+        "close": 15 * 60 * 60 + 30 * 60,
+        "weekdays_only": True,
+    },
+    "nasdaq": {
+        "meta": {
+            "currency": "USD",
+            "exchangeName": "NMS",
+            "fullExchangeName": "NasdaqGS",
+            "instrumentType": "EQUITY",
+            "timezone": "EDT",
+            "gmtoffset": -14400,
+            "exchangeTimezoneName": "America/New_York",
+        },
+        "open": 13 * 60 * 60 + 30 * 60,
+        "close": 20 * 60 * 60,
+        "weekdays_only": True,
+    },
+}
+
+
+def _exchange_profile(ticker):
+    if ticker.endswith("-USD"):
+        return EXCHANGE_PROFILES["crypto"]
+    if ticker.endswith(".L"):
+        return EXCHANGE_PROFILES["london"]
+    return EXCHANGE_PROFILES["nasdaq"]
+
+
+def slice_chart_payload(payload, chart_range):
+    """returns payload cut down to the most recent bars of chart_range (e.g. "1mo")"""
+    result = payload["chart"]["result"][0]
+    keep = RANGE_BARS.get(chart_range)
+    if keep is None or keep >= len(result["timestamp"]):
+        return payload
+
+    quote_ = result["indicators"]["quote"][0]
+    sliced = {
+        **result,
+        "meta": {**result["meta"], "range": chart_range},
+        "timestamp": result["timestamp"][-keep:],
+        "indicators": {
+            "quote": [{key: values[-keep:] for key, values in quote_.items()}],
+            "adjclose": [{"adjclose": result["indicators"]["adjclose"][0]["adjclose"][-keep:]}],
+        },
+    }
+    return {"chart": {"result": [sliced], "error": payload["chart"]["error"]}}
+
+
+def shift_chart_payload(payload, now=None):
+    """
+    returns payload with every timestamp moved forward by whole weeks, so that
+    its last bar falls within the week before now and weekdays are kept
+    """
+    result = payload["chart"]["result"][0]
+    now = int(now or time.time())
+    shift = (now - result["meta"]["regularMarketTime"]) // WEEK * WEEK
+    if shift <= 0:
+        return payload
+
+    meta = dict(result["meta"])
+    for key in ("firstTradeDate", "regularMarketTime"):
+        if meta.get(key) is not None:
+            meta[key] += shift
+    if "currentTradingPeriod" in meta:
+        meta["currentTradingPeriod"] = {
+            name: {**period, "start": period["start"] + shift, "end": period["end"] + shift}
+            for name, period in meta["currentTradingPeriod"].items()
+        }
+    shifted = {**result, "meta": meta, "timestamp": [t + shift for t in result["timestamp"]]}
+    return {"chart": {"result": [shifted], "error": payload["chart"]["error"]}}
+
+
+def synthetic_chart_payload(ticker, n_bars=1260, now=None, chart_range=None):
+    """
+    returns a v8 chart payload with n_bars daily bars ending at now, or only the
+    most recent bars of those when chart_range (e.g. "1mo") is given
+    """
+    rng = random.Random(ticker)
+    now = int(now or time.time())
+    profile = _exchange_profile(ticker)
+    open_offset, close_offset = profile["open"], profile["close"]
+    day = now - now % DAY
+
+    days = []
+    while len(days) < n_bars:
+        if not profile["weekdays_only"] or time.gmtime(day).tm_wday < 5:
+            days.append(day)
+        day -= DAY
+    days.reverse()
+
+    timestamps = [d + open_offset for d in days]
+    timestamps[-1] = min(now, days[-1] + close_offset)
+
+    price = rng.uniform(10, 500)
+    volume = rng.randint(10**5, 10**8)
+    adjclose, open_, low, high, volumes = [], [], [], [], []
+    for _ in days:
+        open_.append(round(price * (1 + rng.gauss(0, 0.005)), 4))
+        price *= 1 + rng.gauss(0.0003, 0.02)
+        adjclose.append(round(price, 4))
+        low.append(round(min(price, open_[-1]) * (1 - rng.uniform(0, 0.02)), 4))
+        high.append(round(max(price, open_[-1]) * (1 + rng.uniform(0, 0.02)), 4))
+        volumes.append(int(volume * rng.lognormvariate(0, 0.4)))
+
+    regular = {
+        "timezone": profile["meta"]["timezone"],
+        "start": days[-1] + open_offset,
+        "end": days[-1] + close_offset,
+        "gmtoffset": profile["meta"]["gmtoffset"],
+    }
+    meta = {
+        **profile["meta"],
+        "symbol": ticker,
+        "firstTradeDate": timestamps[0] - 365 * DAY,
+        "regularMarketTime": timestamps[-1],
+        "regularMarketPrice": adjclose[-1],
+        "fiftyTwoWeekHigh": max(high[-252:]),
+        "fiftyTwoWeekLow": min(low[-252:]),
+        "regularMarketDayHigh": high[-1],
+        "regularMarketDayLow": low[-1],
+        "regularMarketVolume": volumes[-1],
+        "longName": f"{ticker} Synthetic Holdings Inc.",
+        "shortName": f"{ticker} Synthetic",
+        "chartPreviousClose": adjclose[0],
+        "priceHint": 2,
+        "currentTradingPeriod": {"pre": regular, "regular": regular, "post": regular},
+        "dataGranularity": "1d",
+        "range": "5y",
+    }
+
+    payload = {
+        "chart": {
+            "result": [
+                {
+                    "meta": meta,
+                    "timestamp": timestamps,
+                    "indicators": {
+                        "quote": [
+                            {
+                                "low": low,
+                                "high": high,
+                                "close": adjclose,
+                                "open": open_,
+                                "volume": volumes,
+                            }
+                        ],
+                        "adjclose": [{"adjclose": adjclose}],
+                    },
+                }
+            ],
+            "error": None,
+        }
+    }
+    return slice_chart_payload(payload, chart_range) if chart_range else payload
+
+
+def synthetic_search_payload(query, n_quotes=6):
+    """returns a search payload with n_quotes quotes whose symbols start with query"""
+    rng = random.Random(query)
+    symbol = query.upper()
+    quotes = []
+    for i in range(n_quotes):
+        ticker = symbol if i == 0 else f"{symbol}{chr(ord('A') + i - 1)}"
+        if i == n_quotes - 1:
+            ticker = f"{symbol}-USD"
+        profile = _exchange_profile(ticker)
+        quotes.append(
+            {
+                "exchange": profile["meta"]["exchangeName"],
+                "shortname": f"{ticker} Synthetic",
+                "quoteType": profile["meta"]["instrumentType"],
+                "symbol": ticker,
+                "score": round(rng.uniform(1000, 50000), 1),
+                "exchDisp": profile["meta"]["fullExchangeName"],
+            }
+        )
+    return {"count": len(quotes), "quotes": quotes, "news": []}
+
+
+class FixtureStore:
+    """gzipped JSON responses under directory/chart and directory/search"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def _path(self, kind, key):
+        return self.directory / kind / f"{quote(key, safe='')}.json.gz"
+
+    def load(self, kind, key):
+        path = self._path(kind, key)
+        if not path.exists():
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, kind, key, payload):
+        path = self._path(kind, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f)
+
+
+def generate_fixtures(directory, tickers, n_bars=1260):
+    """writes a synthetic 5y chart fixture for each ticker"""
+    store = FixtureStore(directory)
+    for ticker in tickers:
+        store.save("chart", ticker, synthetic_chart_payload(ticker, n_bars))
+
+
+class StandInServer:
+    """
+    Threaded HTTP server serving chart and search payloads on localhost.
+
+    Usage:
+        with StandInServer(latency=0.05) as server:
+            models.models.YAHOO_BASE_URL = server.url
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        n_bars=1260,
+        rate_limit=None,
+        burst=1,
+        error_rate=0.0,
+        fixtures_dir=None,
+        record=False,
+        synthetic=True,
+        seed=0,
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.latency = latency
+        self.n_bars = n_bars
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.error_rate = error_rate
+        self.fixtures = FixtureStore(fixtures_dir) if fixtures_dir else None
+        self.record = record
+        self.synthetic = synthetic
+        self.request_count = 0
+        self.throttled_count = 0
+        self.error_count = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._tokens = float(burst)
+        self._tokens_updated = time.monotonic()
+        self._payloads = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def search_url(self):
+        return f"{self.url}/search?q="
+
+    def _throttle(self):
+        """returns None if the request is within rate_limit, else Retry-After in seconds"""
+        if not self.rate_limit:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._tokens_updated) * self.rate_limit
+            )
+            self._tokens_updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return None
+            self.throttled_count += 1
+            return max(1, math.ceil((1 - self._tokens) / self.rate_limit))
+
+    def _fails(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            if self._rng.random() >= self.error_rate:
+                return False
+            self.error_count += 1
+            return True
+
+    def _record(self, kind, key, chart_range="5y"):
+        """fetches a response from YAHOO_BASE_URL / YAHOO_SEARCH_URL and saves it as a fixture"""
+        if kind == "chart":
+            url = f"{YAHOO_BASE_URL}/redacted_path/{key}?range={chart_range}&interval=1d"
+        else:
+            url = f"{YAHOO_SEARCH_URL}{key}"
+        response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=15)
+        response.raise_for_status()
+        payload = response.json()
+        self.fixtures.save(kind, key, payload)
+        return payload
+
+    def _load(self, kind, key, chart_range=None):
+        """returns the payload of a chart or search request, or None"""
+        payload = self.fixtures.load(kind, key) if self.fixtures else None
+        if payload is None and self.record and self.fixtures:
+            payload = self._record(kind, key)
+        if payload is not None:
+            if kind == "chart":
+                payload = slice_chart_payload(shift_chart_payload(payload), chart_range)
+            return payload
+        if not self.synthetic:
+            return None
+        if kind == "chart":
+            return synthetic_chart_payload(key, self.n_bars, chart_range=chart_range)
+        return synthetic_search_payload(key)
+
+    def _payload(self, kind, key, chart_range=None):
+        with self._lock:
+            self.request_count += 1
+            cache_key = (kind, key, chart_range)
+            body = self._payloads.get(cache_key)
+        if body is None:
+            payload = self._load(kind, key, chart_range)
+            if payload is None:
+                return None
+            body = json.dumps(payload).encode("utf-8")
+            with self._lock:
+                self._payloads[cache_key] = body
+        with self._lock:
+            self.bytes_sent += len(body)
+        return body
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body are separate writes; with Nagle on, small bodies
+            # would wait for the delayed ACK of the headers on keep-alive sockets
+            disable_nagle_algorithm = True
+
+            def _send(self, status, body, headers=()):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                for key, value in headers:
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path.rstrip("/").endswith("/search"):
+                    kind, key, chart_range = "search", query.get("q", [""])[0], None
+                else:
+                    kind = "chart"
+                    key = unquote(url.path.rstrip("/").split("/")[-1])
+                    chart_range = query.get("range", ["5y"])[0]
+                if server.latency:
+                    time.sleep(server.latency)
+
+                retry_after = server._throttle()
+                if retry_after is not None:
+                    body = b'{"error": "Too Many Requests"}'
+                    self._send(429, body, [("Retry-After", str(retry_after))])
+                    return
+                if server._fails():
+                    self._send(500, b'{"error": "Internal Server Error"}')
+                    return
+                try:
+                    body = server._payload(kind, key, chart_range)
+                except requests.RequestException as e:
+                    self._send(502, json.dumps({"error": str(e)}).encode("utf-8"))
+                    return
+                if body is None:
+                    self._send(404, b'{"error": "Not Found"}')
+                    return
+                self._send(200, body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="serve fixtures (or synthetic payloads)")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8010)
+    serve.add_argument("--fixtures", default=None, help="fixture directory")
+    serve.add_argument("--record", action="store_true", help="record missing fixtures from upstream")
+    serve.add_argument("--no-synthetic", action="store_true", help="404 instead of synthetic payloads")
+    serve.add_argument("--latency", type=float, default=0.0)
+    serve.add_argument("--error-rate", type=float, default=0.0)
+    serve.add_argument("--rate-limit", type=float, default=None)
+    serve.add_argument("--burst", type=int, default=1)
+    serve.add_argument("--seed", type=int, default=0)
+
+    generate = commands.add_parser("generate", help="write synthetic 5y chart fixtures")
+    generate.add_argument("--fixtures", required=True, help="fixture directory")
+    generate.add_argument("--tickers", type=int, default=1000)
+    generate.add_argument("--bars", type=int, default=1260)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        start = time.perf_counter()
+        generate_fixtures(args.fixtures, (f"T{i:05d}" for i in range(args.tickers)), args.bars)
+        elapsed = time.perf_counter() - start
+        print(f"wrote {args.tickers} chart fixtures to {args.fixtures} in {elapsed:.1f}s")
+        return
+
+    if args.record and not args.fixtures:
+        parser.error("--record needs --fixtures")
+    server = StandInServer(
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        error_rate=args.error_rate,
+        fixtures_dir=args.fixtures,
+        record=args.record,
+        synthetic=not args.no_synthetic,
+        seed=args.seed,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"YAHOO_BASE_URL={server.url} YAHOO_SEARCH_URL={server.search_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
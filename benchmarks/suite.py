@@ -0,0 +1,311 @@
+"""
+Benchmark suite of the model layer, cron rendering and grid column setup, at
+several portfolio sizes. No network is used: chart payloads come from recorded
+fixtures (see benchmarks/stand_in_server.py) or are synthetic, and refresh_all
+runs against a stub fetcher. Cases:
+
+    parse_5y         RawDataList._query_5y_one_ticker on chart payloads (per ticker)
+    mutate_rows      DataList._mutate_data_list (derived fields of each row) over the rows
+    refresh_all      DataList.refresh_all with _query_one_ticker stubbed out
+    col_defs         create_portfolio_table_col_defs on the col_def sheet (size-independent)
+    daily_email      cron create_daily_email_body over the rows
+    lt_email         cron create_email_body_lt (weekly) over the rows
+
+Results (best and median of --repeat runs) are written to JSON, by default
+benchmarks/results/<commit>.json; --compare prints the ratio to an earlier
+result file and exits non-zero if a case got slower than --threshold times.
+
+Requires a local MongoDB (BENCH_MONGODB_URI, default mongodb://localhost:27017).
+
+    python -m benchmarks.suite --sizes 10 100 1000 10000 --repeat 3
+    python -m benchmarks.suite --compare benchmarks/results/<older commit>.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+os.environ.setdefault(
+    "MONGODB_URI", os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+)
+
+import pandas as pd  # noqa: E402
+
+from benchmarks.stand_in_server import FixtureStore, synthetic_chart_payload  # noqa: E402
+from cron_jobs.cron_job import (  # noqa: E402
+    DAILY_TABLE_FIELDS,
+    create_daily_email_body,
+    create_email_body_lt,
+)
+from models import models  # noqa: E402
+from models.chart_fields import missing_field_log  # noqa: E402
+from models.database import get_db_connection  # noqa: E402
+from models.migrations import migrate_indexes  # noqa: E402
+from utils.enums import FreqMode  # noqa: E402
+from utils.portfolio_table_inputs import create_portfolio_table_col_defs  # noqa: E402
+from utils.reference import INPUT_FIELDS_FILE_PATH  # noqa: E402
+
+BENCH_USERNAME = "benchmark_user"
+RESULTS_DIR = Path(__file__).parent / "results"
+
+LT_TABLE_FIELDS = [
+    "latestMarketTimeWithTimeZone",
+    "companyName",
+    "ticker",
+    "regularMarketPrice",
+    "percent1D",
+    "percent1W",
+    "percent1M",
+    "percent1Y",
+    "percent5Y",
+]
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+def _chart_results(fixtures_dir, n_distinct):
+    """chart results of recorded fixtures if given, else of synthetic payloads"""
+    payloads = []
+    if fixtures_dir:
+        store = FixtureStore(fixtures_dir)
+        for path in sorted((Path(fixtures_dir) / "chart").glob("*.json.gz"))[:n_distinct]:
+            ticker = path.name[: -len(".json.gz")]
+            payloads.append(store.load("chart", ticker))
+    if not payloads:
+        payloads = [synthetic_chart_payload(f"T{i:05d}") for i in range(n_distinct)]
+    return [payload["chart"]["result"][0] for payload in payloads]
+
+
+def _user_input(i):
+    return {
+        "priority": float(i % 5),
+        "personal_note": f"note {i}",
+        "averageBuyPrice": 50.0 + i % 100,
+        "positionQuantity": 10 + i % 50,
+        "priceUpperTarget": 500.0,
+        "priceLowerTarget": 5.0,
+    }
+
+
+def _time(run, repeat, setup=None):
+    """returns the durations of repeat runs; setup (untimed) returns run's argument"""
+    durations = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        run(arg)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+class Suite:
+    def __init__(self, chart_results, repeat):
+        self.chart_results = chart_results
+        self.repeat = repeat
+        self.results = []
+
+        db = get_db_connection()
+        migrate_indexes(db, prefix="bench_")
+        self.holdings = db["bench_holdings"]
+        self.market_data = db["bench_market_data"]
+        self.dl = models.DataList(
+            self.holdings, self.market_data, FreqMode.DAILY, BENCH_USERNAME
+        )
+        self.rdl = self.dl.rdl
+
+        # parse_5y reads the chart result of each ticker from the pool
+        self._charts_by_ticker = {}
+        self.rdl._query_5y_chart = lambda ticker: self._charts_by_ticker[ticker]
+        self._raw_outputs = {}
+        self.rdl._query_one_ticker = lambda ticker: dict(self._raw_outputs[ticker])
+
+    def _record(self, name, size, durations):
+        best = min(durations)
+        result = {
+            "benchmark": name,
+            "size": size,
+            "repeat": len(durations),
+            "best_s": best,
+            "median_s": statistics.median(durations),
+            "per_row_us": best / size * 1e6 if size else None,
+        }
+        self.results.append(result)
+        per_row = f"{result['per_row_us']:10.1f} us/row" if size else ""
+        print(f"{name:<12} {size or '-':>6} best {best * 1000:10.2f} ms {per_row}")
+
+    def tickers(self, size):
+        return [f"T{i:05d}" for i in range(size)]
+
+    def parse_5y(self, size):
+        tickers = self.tickers(size)
+        for i, ticker in enumerate(tickers):
+            self._charts_by_ticker[ticker] = self.chart_results[i % len(self.chart_results)]
+
+        def run(_):
+            for ticker in tickers:
+                self._raw_outputs[ticker] = self.rdl._query_5y_one_ticker(ticker)
+            missing_field_log.report()
+
+        self._record("parse_5y", size, _time(run, self.repeat))
+
+    def rows(self, size):
+        """raw_data of size tickers: parsed raw_output plus user_input"""
+        return [
+            {
+                "username": BENCH_USERNAME,
+                "freq_mode": FreqMode.DAILY,
+                **_user_input(i),
+                **self._raw_outputs[ticker],
+            }
+            for i, ticker in enumerate(self.tickers(size))
+        ]
+
+    def mutate_rows(self, size):
+        def run(rows):
+            self.dl._mutate_data_list(rows)
+
+        self._record("mutate_rows", size, _time(run, self.repeat, lambda: self.rows(size)))
+        self.mutated = self.rows(size)
+        run(self.mutated)
+
+    def refresh_all(self, size):
+        self.holdings.delete_many({"username": BENCH_USERNAME})
+        self.holdings.insert_many(
+            [
+                {
+                    "username": BENCH_USERNAME,
+                    "freq_mode": FreqMode.DAILY,
+                    "ticker": ticker,
+                    **_user_input(i),
+                }
+                for i, ticker in enumerate(self.tickers(size))
+            ]
+        )
+        self._record("refresh_all", size, _time(lambda _: self.dl.refresh_all(), self.repeat))
+        self.holdings.delete_many({"username": BENCH_USERNAME})
+        self.market_data.delete_many({"ticker": {"$in": self.tickers(size)}})
+
+    def col_defs(self):
+        col_def = pd.read_excel(INPUT_FIELDS_FILE_PATH, sheet_name="col_def")
+        self._record(
+            "col_defs", None, _time(lambda _: create_portfolio_table_col_defs(col_def), self.repeat)
+        )
+
+    def daily_email(self, size):
+        df = pd.DataFrame(self.mutated)[DAILY_TABLE_FIELDS]
+        self._record(
+            "daily_email",
+            size,
+            _time(lambda _: create_daily_email_body(df, pd.DataFrame()), self.repeat),
+        )
+
+    def lt_email(self, size):
+        df = pd.DataFrame(self.mutated)[LT_TABLE_FIELDS]
+        self._record(
+            "lt_email",
+            size,
+            _time(
+                lambda _: create_email_body_lt(df, pd.DataFrame(), FreqMode.WEEKLY),
+                self.repeat,
+            ),
+        )
+
+    def run(self, sizes):
+        self.col_defs()
+        for size in sizes:
+            self.parse_5y(size)
+            self.mutate_rows(size)
+            self.refresh_all(size)
+            self.daily_email(size)
+            self.lt_email(size)
+        return self.results
+
+
+def _compare(results, baseline_path, threshold):
+    """prints current / baseline best times and returns the regressed cases"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["benchmark"], r["size"]): r["best_s"] for r in baseline["results"]}
+
+    print(f"\ncompared with {baseline['commit']} ({baseline_path})")
+    regressions = []
+    for result in results:
+        key = (result["benchmark"], result["size"])
+        if key not in previous:
+            continue
+        ratio = result["best_s"] / previous[key]
+        flag = " REGRESSION" if ratio > threshold else ""
+        print(f"{key[0]:<12} {key[1] or '-':>6} {ratio:6.2f}x{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fixtures", default=None, help="recorded fixture directory")
+    parser.add_argument("--distinct", type=int, default=100, help="distinct chart payloads")
+    parser.add_argument("--out", default=None, help="result file (default: results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier result file")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args()
+
+    chart_results = _chart_results(args.fixtures, args.distinct)
+    commit, dirty = _git_commit()
+    print(f"commit={commit}{' (dirty)' if dirty else ''} payloads={len(chart_results)}")
+
+    results = Suite(chart_results, args.repeat).run(args.sizes)
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{commit}{'-dirty' if dirty else ''}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(
+            {
+                "commit": commit,
+                "dirty": dirty,
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "payloads": "fixtures" if args.fixtures else "synthetic",
+                "repeat": args.repeat,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"results written to {out}")
+
+    if args.compare:
+        regressions = _compare(results, args.compare, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
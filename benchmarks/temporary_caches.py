@@ -0,0 +1,19 @@
+"""
+Points the diskcache caches of utils/cache_setup.py at a temporary directory,
+removed at exit. Benchmarks clear their caches between runs; in the app's
+directory that would also drop the chart_last_good fallbacks and the shared
+circuit breaker and rate limiter state. Call it before importing utils or models.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+
+def use_temporary_caches():
+    directory = tempfile.mkdtemp(prefix="benchmark_caches_")
+    os.environ["CACHE_DIR"] = directory
+    # forked workers leave through os._exit, so only the parent removes it
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return directory
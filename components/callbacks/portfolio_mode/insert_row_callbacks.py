@@ -1,5 +1,5 @@
 from utils.reference import YAHOO_SEARCH_URL
-import requests
+from utils.http_client import http_get
 from dash import callback, Output, Input, State, ctx, MATCH, ALL
 from dash.exceptions import PreventUpdate
 from dash_iconify import DashIconify
@@ -26,7 +26,7 @@ def update_ticker_suggestions(search_value):
     try:
         url = f"{YAHOO_SEARCH_URL}{search_value}"
         headers = {"User-Agent": "Mozilla/5.0"}
-        r = requests.get(url, headers=headers)
+        r = http_get(url, headers=headers)
         r.raise_for_status()
         quotes = r.json().get("quotes", [])
 
@@ -265,7 +265,12 @@ def handle_insert_row_submit(
             }
         )
 
-    rowData.append(dl.append(user_input))
+    try:
+        rowData.append(dl.append(user_input))
+    except ValueError as e:
+        # keep the form as entered so it can be corrected
+        print(f"[WARNING] {ticker}: {e}")
+        raise PreventUpdate
 
     # Get undo button states for all modes and store them
     undo_states = dl.is_all_trash_empty()
@@ -28,7 +28,12 @@ def user_edit_cell(event, rowData, component_id):
     new_value = event[0]["value"]
 
     dl = get_data_list(FreqMode(mode))
-    new_row = dl.update_user_input(ticker, key_to_update, new_value)
+    try:
+        new_row = dl.update_user_input(ticker, key_to_update, new_value)
+    except ValueError as e:
+        # not stored; put the previous value back in the grid
+        print(f"[WARNING] {ticker}: {e}")
+        new_row = {**output, key_to_update: event[0].get("oldValue")}
 
     for i, item in enumerate(rowData):
         if item.get("ticker") == ticker:
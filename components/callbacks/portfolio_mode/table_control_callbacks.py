@@ -1,24 +1,116 @@
-from dash import callback, Output, Input, State, MATCH, Patch
+from dash import callback, clientside_callback, Output, Input, State, MATCH, Patch
 from dash.exceptions import PreventUpdate
 from models.models import get_data_list
 from utils.enums import FreqMode
-
-
-@callback(
-    Output({"type": "portfolio-table", "mode": MATCH}, "rowData", allow_duplicate=True),
+from utils.reference import RELOAD_BATCH_SIZE
+
+
+# mark every row stale in the browser as soon as Reload is clicked; refreshed rows
+# replace them as they arrive from reload_button_click
+clientside_callback(
+    """
+    function (n_clicks, rowData) {
+        if (!n_clicks || !rowData) {
+            return window.dash_clientside.no_update;
+        }
+        return {update: rowData.map((row) => ({...row, isStale: true}))};
+    }
+    """,
+    Output({"type": "portfolio-table", "mode": MATCH}, "rowTransaction"),
     Input({"type": "reload-button", "mode": MATCH}, "n_clicks"),
-    State({"type": "reload-button", "mode": MATCH}, "id"),
+    State({"type": "portfolio-table", "mode": MATCH}, "rowData"),
     prevent_initial_call=True,
-    allow_duplicate=True,
 )
-def reload_button_click(n_clicks, component_id):
-    mode = component_id["mode"]
 
-    if n_clicks == 0:
-        raise PreventUpdate
 
-    rowData = get_data_list(FreqMode(mode)).refresh_all()
-    return rowData
+def register_reload_callback(mode: FreqMode):
+    """
+    Reload runs as a background job so the page stays responsive. Refreshed rows
+    are pushed to the grid batch by batch through progress, and the job can be
+    cancelled with the cancel button.
+
+    Progress is polled, so a batch followed by another before the next poll is
+    only shown with the final rowData, which holds every row once the job ends.
+    The callback is registered per mode, with concrete ids, because progress,
+    running and cancel do not resolve pattern-matching ids.
+    """
+    table_id = {"type": "portfolio-table", "mode": mode.value}
+    reload_id = {"type": "reload-button", "mode": mode.value}
+    cancel_id = {"type": "reload-cancel-button", "mode": mode.value}
+    progress_id = {"type": "reload-progress", "mode": mode.value}
+
+    @callback(
+        Output(table_id, "rowData", allow_duplicate=True),
+        Input(reload_id, "n_clicks"),
+        State(table_id, "rowData"),
+        background=True,
+        progress=[Output(table_id, "rowTransaction"), Output(progress_id, "children")],
+        running=[
+            (Output(reload_id, "loading"), True, False),
+            (Output(cancel_id, "display"), "inline-block", "none"),
+            (Output(progress_id, "children"), "Reloading...", ""),
+        ],
+        cancel=[Input(cancel_id, "n_clicks")],
+        interval=500,
+        prevent_initial_call=True,
+    )
+    def reload_button_click(set_progress, n_clicks, rowData):
+        if n_clicks == 0:
+            raise PreventUpdate
+
+        total = len(rowData or [])
+        new_rowData = []
+        batch = []
+        for data in get_data_list(mode).iter_refresh(batch_size=RELOAD_BATCH_SIZE):
+            new_rowData.append(data)
+            batch.append(data)
+            if len(batch) == RELOAD_BATCH_SIZE:
+                set_progress(({"update": batch}, f"Reloading {len(new_rowData)} / {total}"))
+                batch = []
+
+        return new_rowData
+
+
+def register_revalidate_callback(mode: FreqMode):
+    """
+    Stale-while-revalidate: the grid is first rendered from Mongo as is, then
+    this background job refreshes only the rows past their FRESHNESS_TTL and
+    patches them into the grid, through progress as batches complete and all
+    together in the final rowTransaction.
+    """
+    table_id = {"type": "portfolio-table", "mode": mode.value}
+    progress_id = {"type": "reload-progress", "mode": mode.value}
+
+    @callback(
+        Output(table_id, "rowTransaction", allow_duplicate=True),
+        Input(table_id, "id"),
+        background=True,
+        progress=[Output(table_id, "rowTransaction")],
+        running=[(Output(progress_id, "children"), "Updating stale rows...", "")],
+        interval=1000,
+        # runs when the grid is rendered
+        prevent_initial_call="initial_duplicate",
+    )
+    def revalidate_stale_rows(set_progress, component_id):
+        refreshed = []
+        batch = []
+        dl = get_data_list(mode)
+        for data in dl.iter_refresh(batch_size=RELOAD_BATCH_SIZE, stale_only=True):
+            refreshed.append(data)
+            batch.append(data)
+            if len(batch) == RELOAD_BATCH_SIZE:
+                set_progress({"update": batch})
+                batch = []
+
+        if not refreshed:
+            raise PreventUpdate
+
+        return {"update": refreshed}
+
+
+for mode in FreqMode:
+    register_reload_callback(mode)
+    register_revalidate_callback(mode)
 
 
 @callback(
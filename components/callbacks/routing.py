@@ -3,12 +3,7 @@ from dash import callback, Output, Input, State, no_update
 from dash.exceptions import PreventUpdate
 import flask
 import bcrypt
-from models.models import get_data_list, get_alert_list
 from models.database import get_db_connection
-from utils.enums import FreqMode
-
-
-mongodb = get_db_connection()
 
 
 @callback(
@@ -24,7 +19,7 @@ def login_button_disabled(username, password):
 
 def _authenticate_user(username, password):
     try:
-        users_collection = mongodb["users"]
+        users_collection = get_db_connection()["users"]
         user = users_collection.find_one({"username": username})
         if user is None:
             return False
@@ -89,11 +84,7 @@ def logout_submit(n_clicks):
 def render_routes(pathname):
     if flask.session.get("user"):
         if pathname == "/main":
-            username = flask.session.get("user")
-            dl = get_data_list(FreqMode.DAILY)
-            al = get_alert_list(FreqMode.DAILY)
-            dl.update_username(username)
-            al.update_username(username)
+            # models read the user from the session on each callback
             return main_app_layout(), no_update
         else:
             return no_update, "/main"
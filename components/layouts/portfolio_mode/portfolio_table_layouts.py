@@ -15,10 +15,17 @@ col_def = pd.read_excel(INPUT_FIELDS_FILE_PATH, sheet_name="col_def")
 
 
 def portfolio_table_layout(mode: FreqMode = FreqMode.DAILY):
+    # rendered straight from Mongo; rows past their freshness TTL are marked stale
+    # and refreshed in the background by revalidate_stale_rows
+    dl = get_data_list(mode)
+    rowData = [
+        {**data, "isStale": True} if dl.is_stale(data) else data for data in dl.read_all()
+    ]
+
     return dag.AgGrid(
         id={"type": "portfolio-table", "mode": mode.value},
         className="ag-theme-quartz",
-        rowData=get_data_list(mode).read_all(),
+        rowData=rowData,
         columnDefs=create_portfolio_table_col_defs(col_def),
         getRowId="params.data.ticker",
         defaultColDef=portfolio_table_default_col_def,
@@ -31,6 +31,20 @@ def table_control_layout(mode: FreqMode = FreqMode.DAILY):
                         children=dmc.Text("Reload", size="xs"),
                         className="dramatic-hover",
                     ),
+                    dmc.Button(
+                        id={"type": "reload-cancel-button", "mode": mode.value},
+                        size="xs",
+                        radius="md",
+                        variant="outline",
+                        n_clicks=0,
+                        display="none",
+                        leftSection=DashIconify(
+                            icon="material-symbols:cancel-outline-rounded",
+                            width=20,
+                            height=20,
+                        ),
+                        children=dmc.Text("Cancel", size="xs"),
+                    ),
                     dmc.Button(
                         id={"type": "undo-button", "mode": mode.value},
                         size="xs",
@@ -61,6 +75,11 @@ def table_control_layout(mode: FreqMode = FreqMode.DAILY):
                         children=dmc.Text("Clear Sort", size="xs"),
                         className="dramatic-hover",
                     ),
+                    dmc.Text(
+                        id={"type": "reload-progress", "mode": mode.value},
+                        size="xs",
+                        c="dimmed",
+                    ),
                 ],
             ),
             dmc.Title(
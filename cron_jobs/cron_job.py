@@ -9,22 +9,39 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# the only fields of a refreshed row used by the daily tables
+DAILY_TABLE_FIELDS = [
+    "ticker",
+    "companyName",
+    "latestMarketTimeWithTimeZone",
+    "regularMarketDayHigh",
+    "regularMarketDayLow",
+    "regularMarketPrice",
+    "percent1D",
+    "percent1W",
+    "percent1M",
+]
+
 
 def create_daily_tables(chosen_user_name):
     # Database access now goes through models.py
-    dl = get_data_list(FreqMode.DAILY)
-    dl.update_username(chosen_user_name)
-    data_list = dl.refresh_all()
+    dl = get_data_list(FreqMode.DAILY, chosen_user_name)
+    # rows are streamed and trimmed as they are refreshed, so large watchlists
+    # are never held in memory in full
+    data_list = [
+        {field: data.get(field) for field in DAILY_TABLE_FIELDS}
+        for data in dl.iter_refresh()
+    ]
     # data_list = dl.read_all()
 
     if not data_list:
         print("⚠️ No tickers found. Exiting early.\n")
         return pd.DataFrame(), pd.DataFrame()
 
-    al = get_alert_list(FreqMode.DAILY)
-    al.update_username(chosen_user_name)
-    alert_list = al.read_all()
-    print(f"# of alerts: {len(alert_list)}\n")
+    al = get_alert_list(FreqMode.DAILY, chosen_user_name)
+    # triggered alerts are never checked again
+    alert_list = al.read_untriggered()
+    print(f"# of untriggered alerts: {len(alert_list)}\n")
 
     # delete all alerts other than chosen_user_name because by design, I only want main user in this app and won't allow other users to use alerts.
     deleted = al.delete_other_alerts(chosen_user_name)
@@ -33,8 +50,7 @@ def create_daily_tables(chosen_user_name):
 
     # delete orphaned tickers where users have created alerts but deleted the ticker from table
     tickers_to_delete = list(
-        set([alert["ticker"] for alert in alert_list])
-        - set([x["ticker"] for x in data_list])
+        set(al.read_tickers()) - set([x["ticker"] for x in data_list])
     )
     deleted = al.delete_orphaned_tickers(tickers_to_delete)
     if deleted > 0:
@@ -159,8 +175,7 @@ def create_lt_duration_tables(chosen_user_name, mode):
     else:
         raise ValueError(f"Invalid mode: {mode}. Must be FreqMode.WEEKLY or FreqMode.MONTHLY")
 
-    dl = get_data_list(mode)
-    dl.update_username(chosen_user_name)
+    dl = get_data_list(mode, chosen_user_name)
     # data_list = dl.refresh_all()
     data_list = dl.read_all()
 
@@ -168,10 +183,10 @@ def create_lt_duration_tables(chosen_user_name, mode):
         print("⚠️ No tickers found. Exiting early.\n")
         return pd.DataFrame(), pd.DataFrame()
 
-    al = get_alert_list(mode)
-    al.update_username(chosen_user_name)
-    alert_list = al.read_all()
-    print(f"# of alerts: {len(alert_list)}\n")
+    al = get_alert_list(mode, chosen_user_name)
+    # triggered alerts are never checked again
+    alert_list = al.read_untriggered()
+    print(f"# of untriggered alerts: {len(alert_list)}\n")
 
     # delete all alerts other than chosen_user_name because by design, I only want main user in this app and won't allow other users to use alerts.
     deleted = al.delete_other_alerts(chosen_user_name)
@@ -180,8 +195,7 @@ def create_lt_duration_tables(chosen_user_name, mode):
 
     # delete orphaned tickers where users have created alerts but deleted the ticker from table
     tickers_to_delete = list(
-        set([alert["ticker"] for alert in alert_list])
-        - set([x["ticker"] for x in data_list])
+        set(al.read_tickers()) - set([x["ticker"] for x in data_list])
     )
     deleted = al.delete_orphaned_tickers(tickers_to_delete)
     if deleted > 0:
@@ -243,12 +257,9 @@ def create_lt_duration_tables(chosen_user_name, mode):
 
             ]
         ]
-        # Ensure all percent columns are consistent decimals (not strings with % signs)
+        # percent fields are stored as floats (or None)
         for col in ["percent1D", "percent1W", "percent1M", "percent1Y", "percent5Y"]:
-            if col in lt_change_df.columns:
-                # Convert to numeric, removing any % signs, then multiply by 100
-                lt_change_df[col] = pd.to_numeric(lt_change_df[col].astype(
-                    str).str.replace('%', ''), errors='coerce') * 100
+            lt_change_df[col] = lt_change_df[col].astype(float) * 100
 
         lt_change_df = lt_change_df.sort_values(by=[sort_by_field], ascending=False)
     else:
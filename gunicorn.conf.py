@@ -0,0 +1,35 @@
+"""
+gunicorn settings, picked up from the project root:
+
+    gunicorn app:server
+
+The app is imported once in the master and shared by the forked workers. That is
+safe because nothing connects at import time: the MongoDB client and the HTTP
+session are created lazily in each process (models/database.py,
+utils/http_client.py). The diskcache connections the master opened while
+importing are closed before each fork, so every worker opens its own.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# callbacks build their models per request (models.get_data_list), so workers
+# can serve requests on several threads
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+
+def pre_fork(server, worker):
+    from utils.cache_setup import (
+        cache,
+        market_data_cache,
+        metrics_cache,
+        price_history_cache,
+    )
+
+    # SQLite connections must not be carried across a fork; closed ones are
+    # reopened on next use
+    for disk_cache in (cache, market_data_cache, price_history_cache, metrics_cache):
+        disk_cache.close()
@@ -0,0 +1,101 @@
+"""
+Field extractor for the chart API response, compiled from the v8_finance_chart_5y
+sheet of input_column_definitions.xlsx.
+
+The sheet is validated and turned into a flat list of (field, accessor) pairs
+once at import, so parsing a response is one direct lookup per field instead of
+re-interpreting the sheet rows for every ticker.
+"""
+
+import threading
+
+import pandas as pd
+
+from utils.reference import INPUT_FIELDS_FILE_PATH
+
+# Yahoo Finance API inputs for 5 year chart
+chart_5y_df = pd.read_excel(
+    INPUT_FIELDS_FILE_PATH, sheet_name="v8_finance_chart_5y"
+).drop(columns=["sample_data", "comment"])
+
+
+def _accessor(api_keys):
+    """returns a function reading the value at api_keys from a chart result"""
+    if len(api_keys) == 1:
+        (key1,) = api_keys
+        return lambda base: base[key1]
+    if len(api_keys) == 2:
+        key1, key2 = api_keys
+        return lambda base: base[key1][key2]
+    # e.g. indicators -> adjclose -> [0] -> adjclose
+    key1, key2, key3 = api_keys
+    return lambda base: base[key1][key2][0][key3]
+
+
+def compile_chart_fields(df):
+    """
+    Validates the sheet and returns [(field, accessor), ...] for included rows.
+    Raises ValueError for a row whose api keys are missing or not contiguous.
+    """
+    chart_fields = []
+    for row in df.itertuples(index=False):
+        if not row.include:
+            continue
+
+        api_keys = [row.api_key1, row.api_key2, row.api_key3]
+        present = [pd.notna(key) for key in api_keys]
+        if not present[0] or present != sorted(present, reverse=True):
+            raise ValueError(f"v8_finance_chart_5y has errors in field '{row.field}'")
+        if row.field in (field for field, _ in chart_fields):
+            raise ValueError(f"v8_finance_chart_5y has duplicated field '{row.field}'")
+
+        chart_fields.append((row.field, _accessor(api_keys[: sum(present)])))
+    return chart_fields
+
+
+CHART_FIELDS = compile_chart_fields(chart_5y_df)
+
+
+def extract_chart_fields(base):
+    """
+    returns (values, missing): values maps every included field to its value in
+    the chart result base (None when absent), missing lists the absent fields
+    """
+    values = {}
+    missing = []
+    for field, accessor in CHART_FIELDS:
+        try:
+            values[field] = accessor(base)
+        except (KeyError, IndexError, TypeError):
+            values[field] = None
+            missing.append(field)
+    return values, missing
+
+
+class MissingFieldLog:
+    """
+    Collects the fields missing from chart responses across a batch of tickers
+    (possibly queried from several threads) and reports them once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._missing = {}
+
+    def add(self, ticker, fields):
+        if not fields:
+            return
+        with self._lock:
+            for field in fields:
+                self._missing.setdefault(field, []).append(ticker)
+
+    def report(self):
+        with self._lock:
+            missing, self._missing = self._missing, {}
+
+        for field, tickers in missing.items():
+            shown = ", ".join(tickers[:10]) + (", ..." if len(tickers) > 10 else "")
+            print(f"[WARNING] Missing field '{field}' for {len(tickers)} ticker(s): {shown}")
+
+
+missing_field_log = MissingFieldLog()
@@ -1,28 +1,71 @@
 import os
+import threading
+import time
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 from dotenv import load_dotenv
+from utils.reference import (
+    MONGODB_CONNECT_TIMEOUT_MS,
+    MONGODB_DB_NAME,
+    MONGODB_MAX_IDLE_TIME_MS,
+    MONGODB_MAX_POOL_SIZE,
+    MONGODB_MIN_POOL_SIZE,
+    MONGODB_READY_CACHE_TTL,
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    MONGODB_SOCKET_TIMEOUT_MS,
+)
+from utils.metrics import MongoCommandListener
 
 # Load environment variables
 load_dotenv()
 
-# Singleton-style MongoDB client
+# One MongoDB client per process. MongoClient is not fork-safe (its pool and
+# monitor threads do not survive a fork), so nothing connects at import time: the
+# client is created on first use, and again in a forked child (a preloaded
+# gunicorn worker, a background callback process) instead of inheriting the
+# parent's.
 _client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+# last is_mongodb_connected result of this process, reused by is_mongodb_ready
+_ready = None
+_ready_checked_at = None
+_ready_lock = threading.Lock()
 
 # database.py will be used in models.py to access the database
 # This allows for a single connection to be reused across the app
 
 
+def get_client():
+    """Returns this process's MongoClient, creating it on first use"""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = MongoClient(
+                    os.getenv("MONGODB_URI"),
+                    server_api=ServerApi("1"),
+                    maxPoolSize=MONGODB_MAX_POOL_SIZE,
+                    minPoolSize=MONGODB_MIN_POOL_SIZE,
+                    maxIdleTimeMS=MONGODB_MAX_IDLE_TIME_MS,
+                    connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+                    serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                    socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+                    # counts the commands of each callback for /metrics
+                    event_listeners=[MongoCommandListener()],
+                )
+                _client_pid = os.getpid()
+    return _client
+
+
 def get_db_connection():
     """
-    Returns the MongoDB database instance.
-    Reuses the same client across the app.
+    Returns the MongoDB database instance of this process's client.
+    Call it when the database is used rather than keeping the result at import
+    time, so that a forked process does not use its parent's client.
     """
-    global _client
-    if _client is None:
-        mongodb_uri = os.getenv("MONGODB_URI")
-        _client = MongoClient(mongodb_uri, server_api=ServerApi("1"))
-    return _client["mydb"]
+    return get_client()[MONGODB_DB_NAME]
 
 
 def is_mongodb_connected():
@@ -32,8 +75,25 @@ def is_mongodb_connected():
     """
     print("Checking MongoDB connection...")
     try:
-        get_db_connection().client.admin.command("ping")
+        get_client().admin.command("ping")
         return True
     except Exception as e:
         print(f"MongoDB connection failed: {e}")
         return False
+
+
+def is_mongodb_ready(max_age=None):
+    """
+    is_mongodb_connected, pinging at most once every max_age seconds (defaults to
+    MONGODB_READY_CACHE_TTL) and returning the last result in between, so that
+    frequent scrapes of /metrics do not each wait on a ping.
+    """
+    global _ready, _ready_checked_at
+    if max_age is None:
+        max_age = MONGODB_READY_CACHE_TTL
+    with _ready_lock:
+        now = time.monotonic()
+        if _ready_checked_at is None or now - _ready_checked_at >= max_age:
+            _ready = is_mongodb_connected()
+            _ready_checked_at = now
+        return _ready
@@ -0,0 +1,94 @@
+"""
+Declared types of the stored raw_data fields, enforced when they are written.
+
+Numeric types come from the cellDataType column of the col_def sheet of
+input_column_definitions.xlsx: number_integer columns are ints and every other
+number / percent column is a float. note_string_col columns are strings, and the
+epoch-second timestamps, which have no column, are ints. Other fields are stored
+as given.
+"""
+
+import math
+
+import pandas as pd
+
+from utils.reference import INPUT_FIELDS_FILE_PATH
+
+TIMESTAMP_FIELDS = (
+    "firstTradeDate",
+    "regularMarketTime",
+    "fetchedAt",
+    "regularSessionStart",
+    "regularSessionEnd",
+)
+
+
+def _declared_type(cell_data_type, column_type):
+    if cell_data_type == "number_integer":
+        return int
+    if isinstance(cell_data_type, str) and cell_data_type.startswith(("number", "percent")):
+        return float
+    if column_type == "note_string_col":
+        return str
+    return None
+
+
+col_def_df = pd.read_excel(INPUT_FIELDS_FILE_PATH, sheet_name="col_def")
+
+FIELD_TYPES = {
+    row.field: field_type
+    for row in col_def_df.itertuples(index=False)
+    if (field_type := _declared_type(row.cellDataType, row.type)) is not None
+}
+FIELD_TYPES.update({field: int for field in TIMESTAMP_FIELDS})
+
+
+def coerce_value(field, value):
+    """
+    returns value as the declared type of field; None, NaN and empty strings
+    become None. Numeric strings are parsed ("1,234.5", "12.5%" -> 12.5).
+    Raises ValueError if value cannot be represented as that type.
+    """
+    field_type = FIELD_TYPES.get(field)
+    if field_type is None or value is None:
+        return value
+    if field_type is str:
+        return str(value)
+
+    if isinstance(value, str):
+        text = value.strip().replace(",", "").rstrip("%")
+        if not text:
+            return None
+        try:
+            value = float(text)
+        except ValueError:
+            raise ValueError(f"{field} must be a number, got {value!r}")
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{field} must be a number, got {value!r}")
+    if isinstance(value, float) and math.isnan(value):
+        return None
+
+    if field_type is int:
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError(f"{field} must be a whole number, got {value!r}")
+        return int(value)
+    return float(value)
+
+
+def coerce_fields(data, strict=True):
+    """
+    returns a copy of data with every declared field coerced (see coerce_value).
+    A value that cannot be coerced raises ValueError, or becomes None with a
+    warning if not strict (for API output, where one bad field should not lose
+    the whole ticker).
+    """
+    coerced = {}
+    for field, value in data.items():
+        try:
+            coerced[field] = coerce_value(field, value)
+        except ValueError as e:
+            if strict:
+                raise
+            print(f"[WARNING] {data.get('ticker')}: {e}; stored as None")
+            coerced[field] = None
+    return coerced
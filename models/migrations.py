@@ -0,0 +1,309 @@
+"""
+Data and index migrations, run from the project root, e.g.
+
+    python -m models.migrations indexes
+    python -m models.migrations split_raw_data
+    python -m models.migrations backfill_derived_fields
+
+The models do not create indexes; run the indexes migration at every deploy
+(it only applies the versions the database has not seen yet).
+"""
+
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from pymongo import ReplaceOne, UpdateOne
+
+from models.database import get_db_connection
+from models.field_types import coerce_fields
+from models.models import (
+    HOLDING_KEYS,
+    USER_INPUT_FIELDS,
+    _market_time_strings,
+    _position_cost,
+)
+
+# largest epoch seconds pandas can hold as a nanosecond timestamp, with margin
+_MAX_EPOCH_SECONDS = 9 * 10**9
+
+
+def _drop_index(collection, name):
+    if name in collection.index_information():
+        collection.drop_index(name)
+
+
+def _indexes_v1(collection):
+    """the indexes the model constructors used to create"""
+    collection("holdings").create_index(
+        [("username", 1), ("ticker", 1), ("freq_mode", 1)], unique=True
+    )
+    # also serves the $lookup of read_all
+    collection("market_data").create_index([("ticker", 1)], unique=True)
+    collection("alert_data").create_index(
+        [("username", 1), ("ticker", 1), ("freq_mode", 1), ("created_time", 1)],
+        unique=True,
+    )
+
+
+def _indexes_v2(collection):
+    """
+    primary keys ordered (username, freq_mode, ...): reads are per user and
+    mode (read_all, iter_refresh, AlertList.read_all / read_tickers), lookups of
+    one ticker are exact either way, and is_duplicate (a ticker in any mode) only
+    seeks through the user's three modes. update_triggered_date's $in on _id
+    uses the _id index.
+    """
+    holdings = collection("holdings")
+    holdings.create_index(
+        [("username", 1), ("freq_mode", 1), ("ticker", 1)],
+        unique=True,
+        name="holding_key",
+    )
+    _drop_index(holdings, "username_1_ticker_1_freq_mode_1")
+
+    alert_data = collection("alert_data")
+    alert_data.create_index(
+        [("username", 1), ("freq_mode", 1), ("ticker", 1), ("created_time", 1)],
+        unique=True,
+        name="alert_key",
+    )
+    _drop_index(alert_data, "username_1_ticker_1_freq_mode_1_created_time_1")
+    # the cron's AlertList.read_untriggered; triggered alerts pile up and are
+    # left out of the index
+    alert_data.create_index(
+        [("username", 1), ("freq_mode", 1)],
+        partialFilterExpression={"triggered_date": {"$type": "null"}},
+        name="untriggered_alerts",
+    )
+
+    # login (routing._authenticate_user)
+    collection("users").create_index([("username", 1)], unique=True)
+
+
+# (version, description, migration); append new versions, never change one that
+# has been applied somewhere
+INDEX_MIGRATIONS = [
+    (1, "indexes formerly created by the model constructors", _indexes_v1),
+    (2, "indexes for the per-user reads, untriggered alerts and logins", _indexes_v2),
+]
+
+
+def migrate_indexes(db, prefix=""):
+    """
+    Applies the INDEX_MIGRATIONS newer than the version recorded in the
+    schema_migrations collection, recording each one as it succeeds. prefix is
+    prepended to the collection names (the benchmarks use "bench_").
+    """
+    schema_migrations = db["schema_migrations"]
+    migration_id = f"indexes:{prefix}" if prefix else "indexes"
+    applied = schema_migrations.find_one({"_id": migration_id}) or {}
+    version = applied.get("version", 0)
+
+    for next_version, description, migrate in INDEX_MIGRATIONS:
+        if next_version <= version:
+            continue
+        migrate(lambda name: db[prefix + name])
+        schema_migrations.update_one(
+            {"_id": migration_id},
+            {"$set": {"version": next_version, "applied_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        version = next_version
+        print(f"Applied index migration {next_version}: {description}")
+
+    print(f"Indexes at version {version}" + (f" (collections {prefix}*)" if prefix else ""))
+    return version
+
+
+def split_raw_data(db, batch_size=500):
+    """
+    Splits each raw_data document into its holding (user_input) and the
+    market_data of its ticker. When several users hold a ticker, the most
+    recently fetched copy of its market data is kept. raw_data is left in place;
+    drop it once the app runs on holdings and market_data.
+
+    Safe to run again: holdings are upserted on their primary key and market
+    data is only replaced by a copy fetched at least as recently.
+    """
+    raw_data_collection = db["raw_data"]
+    holdings_collection = db["holdings"]
+    market_data_collection = db["market_data"]
+
+    # the upserts below rely on the unique indexes
+    migrate_indexes(db)
+
+    n_holdings = 0
+    market_data = {}
+    holding_ops = []
+    for raw_data in raw_data_collection.find(projection={"_id": 0}):
+        holding = {}
+        market = {"ticker": raw_data["ticker"]}
+        for key, value in raw_data.items():
+            if key in HOLDING_KEYS or key in USER_INPUT_FIELDS:
+                holding[key] = value
+            else:
+                market[key] = value
+
+        holding_ops.append(
+            UpdateOne(
+                {key: holding[key] for key in HOLDING_KEYS},
+                {"$set": holding},
+                upsert=True,
+            )
+        )
+        if len(holding_ops) >= batch_size:
+            holdings_collection.bulk_write(holding_ops, ordered=False)
+            n_holdings += len(holding_ops)
+            holding_ops = []
+
+        ticker = raw_data["ticker"]
+        kept = market_data.get(ticker)
+        if kept is None or market.get("fetchedAt", 0) >= kept.get("fetchedAt", 0):
+            market_data[ticker] = market
+
+    if holding_ops:
+        holdings_collection.bulk_write(holding_ops, ordered=False)
+        n_holdings += len(holding_ops)
+
+    n_market_data = 0
+    for ticker, market in market_data.items():
+        stored = market_data_collection.find_one({"ticker": ticker}, {"fetchedAt": 1})
+        if stored and stored.get("fetchedAt", 0) > market.get("fetchedAt", 0):
+            continue
+        market_data_collection.replace_one({"ticker": ticker}, market, upsert=True)
+        n_market_data += 1
+
+    print(
+        f"Migrated {n_holdings} raw_data documents into holdings; "
+        f"wrote market_data for {n_market_data} of {len(market_data)} tickers"
+    )
+    return n_holdings, n_market_data
+
+
+def backfill_derived_fields(db, batch_size=500):
+    """
+    Brings documents written before types were enforced up to what the write
+    path stores now: market_data fields are coerced to their declared types
+    (invalid values become None) with ipo and latestMarketTimeWithTimeZone
+    rendered, and holdings are coerced with positionCost computed. A holding
+    whose user_input cannot be coerced is reported and left as is.
+
+    Safe to run again.
+    """
+    market_data_collection = db["market_data"]
+    holdings_collection = db["holdings"]
+
+    n_market_data = 0
+    batch = []
+    for market in market_data_collection.find():
+        batch.append(market)
+        if len(batch) >= batch_size:
+            n_market_data += _backfill_market_data(market_data_collection, batch)
+            batch = []
+    if batch:
+        n_market_data += _backfill_market_data(market_data_collection, batch)
+
+    n_holdings = 0
+    ops = []
+    for holding in holdings_collection.find():
+        try:
+            holding = coerce_fields(holding)
+        except ValueError as e:
+            print(f"[WARNING] skipped holding {holding['_id']} ({holding.get('ticker')}): {e}")
+            continue
+        holding["positionCost"] = _position_cost(holding)
+        ops.append(ReplaceOne({"_id": holding["_id"]}, holding))
+        if len(ops) >= batch_size:
+            holdings_collection.bulk_write(ops, ordered=False)
+            n_holdings += len(ops)
+            ops = []
+    if ops:
+        holdings_collection.bulk_write(ops, ordered=False)
+        n_holdings += len(ops)
+
+    print(f"Backfilled {n_market_data} market_data and {n_holdings} holdings documents")
+    return n_market_data, n_holdings
+
+
+def _add_market_time_fields(data_list):
+    """
+    sets ipo and latestMarketTimeWithTimeZone of every raw_output in data_list
+    from its firstTradeDate / regularMarketTime (None if they are missing or
+    invalid), as models._add_market_time_fields does for one, converting the
+    timestamps of each exchange timezone in one pass
+    """
+    ipo = [None] * len(data_list)
+    latest = [None] * len(data_list)
+    by_timezone = {}
+    for i, data in enumerate(data_list):
+        first_trade = data.get("firstTradeDate")
+        market_time = data.get("regularMarketTime")
+        tz_name = data.get("exchangeTimezoneName")
+        if isinstance(tz_name, str) and all(
+            isinstance(t, int) and not isinstance(t, bool) and abs(t) < _MAX_EPOCH_SECONDS
+            for t in (first_trade, market_time)
+        ):
+            by_timezone.setdefault(tz_name, []).append(i)
+        else:
+            try:
+                ipo[i], latest[i] = _market_time_strings(first_trade, market_time, tz_name)
+            except Exception:
+                pass
+
+    for tz_name, rows in by_timezone.items():
+        try:
+            first_trade = pd.to_datetime(
+                np.array([data_list[i]["firstTradeDate"] for i in rows], dtype=np.int64),
+                unit="s",
+                utc=True,
+            ).tz_convert(tz_name)
+            market_time = pd.to_datetime(
+                np.array([data_list[i]["regularMarketTime"] for i in rows], dtype=np.int64),
+                unit="s",
+                utc=True,
+            ).tz_convert(tz_name)
+        except Exception:
+            # unknown timezone
+            continue
+        for i, ipo_date, market_date in zip(
+            rows,
+            first_trade.strftime("%Y/%m/%d"),
+            market_time.strftime("%Y/%m/%d %I:%M %p"),
+        ):
+            ipo[i] = ipo_date
+            latest[i] = market_date
+
+    for i, data in enumerate(data_list):
+        data["ipo"] = ipo[i]
+        data["latestMarketTimeWithTimeZone"] = (
+            None if latest[i] is None else latest[i] + f" ({data.get('timezone')})"
+        )
+
+
+def _backfill_market_data(market_data_collection, batch):
+    batch = [coerce_fields(market, strict=False) for market in batch]
+    _add_market_time_fields(batch)
+    market_data_collection.bulk_write(
+        [ReplaceOne({"_id": market["_id"]}, market) for market in batch], ordered=False
+    )
+    return len(batch)
+
+
+MIGRATIONS = {
+    "split_raw_data": split_raw_data,
+    "backfill_derived_fields": backfill_derived_fields,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a data or index migration")
+    parser.add_argument("migration", choices=["indexes", *MIGRATIONS])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--prefix", default="", help="collection name prefix (indexes)")
+    args = parser.parse_args()
+    if args.migration == "indexes":
+        migrate_indexes(get_db_connection(), prefix=args.prefix)
+    else:
+        MIGRATIONS[args.migration](get_db_connection(), batch_size=args.batch_size)
@@ -1,24 +1,66 @@
 from datetime import datetime
-from utils.reference import YAHOO_BASE_URL, INPUT_FIELDS_FILE_PATH
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import time
+from utils.reference import (
+    YAHOO_BASE_URL,
+    REFRESH_MAX_WORKERS,
+    REFRESH_WRITE_BATCH_SIZE,
+    FRESHNESS_TTL,
+    PRICE_HISTORY_REFRESH_RANGE,
+    PRICE_HISTORY_MAX_AGE,
+)
+from models.price_history import history_from_chart, merge_history, chart_with_history
+from models.period_windows import PriceWindowIndex, PERIOD_OFFSETS
+from models.chart_fields import extract_chart_fields, missing_field_log
+from models.field_types import coerce_fields, coerce_value
 from models.database import *
 from utils.enums import FreqMode
 
+import numpy as np
 import pandas as pd
 import requests
-from pymongo import ReturnDocument
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 from bson import ObjectId
 import pytz
-from utils.cache_setup import cache
-
-# Yahoo Finance API inputs for 5 year chart
-chart_5y_df = pd.read_excel(
-    INPUT_FIELDS_FILE_PATH, sheet_name="v8_finance_chart_5y"
-).drop(columns=["sample_data", "comment"])
-
-mongodb = get_db_connection()
-
-raw_data_collection = mongodb["raw_data"]
-alert_data_collection = mongodb["alert_data"]
+from utils.cache_setup import cache, market_data_cache, price_history_cache
+from utils.http_client import http_get_with_retry, RETRY_STATUS_CODES
+from utils.market_hours import market_data_ttl, refresh_planner
+from utils.single_flight import SingleFlight
+from utils.rate_limiter import RateLimiter
+from utils.circuit_breaker import CircuitBreaker
+from utils.session_user import current_username
+from utils.metrics import bind_callback_tally
+
+# the fields of a raw_data kept per user in holdings; everything else is market
+# data shared by every holder of the ticker
+HOLDING_KEYS = ("username", "ticker", "freq_mode")
+USER_INPUT_FIELDS = (
+    "priority",
+    "personal_note",
+    "averageBuyPrice",
+    "positionQuantity",
+    "priceUpperTarget",
+    "priceLowerTarget",
+    "alertCount",
+)
+# market data rendered into ipo / latestMarketTimeWithTimeZone when written,
+# and left out of DataList rows (exchangeTimezoneName stays for is_stale)
+MARKET_SOURCE_FIELDS = (
+    "firstTradeDate",
+    "regularMarketTime",
+    "timezone",
+)
+
+# deduplicates concurrent chart fetches of the same ticker (see _query_one_ticker)
+chart_single_flight = SingleFlight(market_data_cache)
+
+# requests per second to the chart API, across all threads and workers
+chart_rate_limiter = RateLimiter(market_data_cache, "chart")
+
+# stops calling the chart API while it keeps failing, across all threads and workers
+chart_circuit_breaker = CircuitBreaker(market_data_cache, "chart")
 
 
 def _perc_chg(output, num_key, den_key):
@@ -28,6 +70,161 @@ def _perc_chg(output, num_key, den_key):
         return None
 
 
+# kinds of a value for the batched derived fields (see
+# DataList._mutate_data_list_on_user): float arithmetic on _FLOAT and _INT values
+# gives exactly what Python gives, on _BIG_INT (ints past 2**53) it would not, and
+# _OTHER is not a number at all
+_FLOAT, _INT, _BIG_INT, _OTHER = range(4)
+_MAX_EXACT_INT = 2**53
+
+
+def _numeric_column(data_list, key):
+    """returns the values of key in data_list as float64 and their kinds"""
+    column = [data.get(key) for data in data_list]
+    if all(type(value) is float for value in column):
+        # the usual case once the inputs are coerced: no kinds to tell apart
+        return np.array(column, dtype=float), np.full(len(column), _FLOAT, dtype=np.int8)
+
+    values = np.full(len(data_list), np.nan)
+    kinds = np.full(len(data_list), _OTHER, dtype=np.int8)
+    for i, value in enumerate(column):
+        # bools count as ints, as they do in Python arithmetic
+        if isinstance(value, float):
+            values[i], kinds[i] = value, _FLOAT
+        elif isinstance(value, int):
+            if abs(value) < _MAX_EXACT_INT:
+                values[i], kinds[i] = value, _INT
+            else:
+                kinds[i] = _BIG_INT
+    return values, kinds
+
+
+def _perc_chg_column(data_list, num, den, num_key, den_key):
+    """_perc_chg of every row; rows float64 cannot reproduce go through _perc_chg"""
+    (num_values, num_kinds), (den_values, den_kinds) = num, den
+    with np.errstate(all="ignore"):
+        result = num_values / den_values - 1
+    exact = (num_kinds <= _INT) & (den_kinds <= _INT) & (den_values != 0)
+    result = result.tolist()
+    for i in np.flatnonzero(~exact):
+        result[i] = _perc_chg(data_list[i], num_key, den_key)
+    return result
+
+
+def _product_column(a, b):
+    """
+    a * b where both are numbers, else None, and a mask of the products computed
+    in float64 (an int * int stays a Python int)
+    """
+    (a_values, a_kinds), (b_values, b_kinds) = a, b
+    with np.errstate(all="ignore"):
+        result = a_values * b_values
+    exact = (a_kinds <= _INT) & (b_kinds <= _INT) & ((a_kinds == _FLOAT) | (b_kinds == _FLOAT))
+    numeric = (a_kinds != _OTHER) & (b_kinds != _OTHER)
+    result = result.tolist()
+    for i in np.flatnonzero(~exact):
+        result[i] = None
+    return result, exact, numeric
+
+
+def _product(a, b):
+    if all(isinstance(v, (int, float)) for v in (a, b)):
+        return a * b
+    return None
+
+
+def _position_cost(holding):
+    return _product(holding.get("averageBuyPrice"), holding.get("positionQuantity"))
+
+
+def _market_time_strings(first_trade, market_time, tz_name):
+    """ipo and latest market time of one ticker, in its exchange timezone"""
+    ipo = (
+        pd.to_datetime(first_trade, unit="s", utc=True)
+        .tz_convert(tz_name)
+        .strftime("%Y/%m/%d")
+    )
+    latest = (
+        pd.to_datetime(market_time, unit="s", utc=True)
+        .tz_convert(tz_name)
+        .strftime("%Y/%m/%d %I:%M %p")
+    )
+    return ipo, latest
+
+
+def _add_market_time_fields(raw_output):
+    """
+    sets ipo and latestMarketTimeWithTimeZone of raw_output from its
+    firstTradeDate / regularMarketTime (None if they are missing or invalid)
+    """
+    try:
+        ipo, latest = _market_time_strings(
+            raw_output.get("firstTradeDate"),
+            raw_output.get("regularMarketTime"),
+            raw_output.get("exchangeTimezoneName"),
+        )
+    except Exception:
+        ipo = latest = None
+    raw_output["ipo"] = ipo
+    raw_output["latestMarketTimeWithTimeZone"] = (
+        None if latest is None else latest + f" ({raw_output.get('timezone')})"
+    )
+
+
+def _is_number(expr):
+    return {"$isNumber": expr}
+
+
+def _perc_chg_expr(num, den):
+    """_perc_chg as an aggregation expression"""
+    return {
+        "$cond": [
+            {"$and": [_is_number(num), _is_number(den), {"$ne": [den, 0]}]},
+            {"$subtract": [{"$divide": [num, den]}, 1]},
+            None,
+        ]
+    }
+
+
+def _product_expr(a, b):
+    return {
+        "$cond": [
+            {"$and": [_is_number(a), _is_number(b)]},
+            {"$multiply": [a, b]},
+            None,
+        ]
+    }
+
+
+POSITION_COST_EXPR = _product_expr("$averageBuyPrice", "$positionQuantity")
+
+# stages turning joined raw_data into DataList rows. The fields that depend on
+# the latest price are derived here: storing them would mean rewriting every
+# holder's document on each refresh of a ticker.
+DISPLAY_STAGES = (
+    {
+        "$addFields": {
+            "percentFromUpperTarget": _perc_chg_expr("$regularMarketPrice", "$priceUpperTarget"),
+            "percentFromLowerTarget": _perc_chg_expr("$regularMarketPrice", "$priceLowerTarget"),
+            "positionFMV": _product_expr("$regularMarketPrice", "$positionQuantity"),
+            "positionReturn": _perc_chg_expr("$regularMarketPrice", "$averageBuyPrice"),
+        }
+    },
+    {
+        "$addFields": {
+            "unrealizedGainLoss": {
+                "$cond": [
+                    {"$and": [_is_number("$positionFMV"), _is_number("$positionCost")]},
+                    {"$subtract": ["$positionFMV", "$positionCost"]},
+                    None,
+                ]
+            }
+        }
+    },
+    {"$project": {field: 0 for field in MARKET_SOURCE_FIELDS}},
+)
+
+
 class RawDataList:
     """
     RawDataList represents a list of raw_data
@@ -37,7 +234,12 @@ class RawDataList:
 
     primary key: (1) username (2) ticker (3) freq_mode
 
-    Document structure:
+    raw_data is stored in two collections, joined on ticker when read:
+    holdings keeps the user_input of each (username, ticker, freq_mode), and
+    market_data keeps one raw_output per ticker, shared by every holder, so a
+    ticker is stored and refreshed once however many users hold it.
+
+    holdings document:
     {
         # primary keys
         'username': 'user123',
@@ -51,6 +253,11 @@ class RawDataList:
         'positionQuantity': 30,
         'priceUpperTarget': 40.20,
         'priceLowerTarget': 20.23,
+    }
+
+    market_data document:
+    {
+        'ticker': '^GSPC',
 
         # raw_output
         'shortName': 'S&P 500',
@@ -59,21 +266,18 @@ class RawDataList:
     }
     """
 
-    def __init__(self, raw_data_collection, freq_mode: FreqMode = FreqMode.DAILY):
-        self.username = None
-        self.freq_mode = freq_mode
-        self.collection = raw_data_collection
-
-        # Create index for faster queries - now includes freq_mode
-        self.collection.create_index(
-            [("username", 1), ("ticker", 1), ("freq_mode", 1)], unique=True
-        )
-
-    def update_username(self, username):
+    def __init__(
+        self,
+        holdings_collection,
+        market_data_collection,
+        freq_mode: FreqMode = FreqMode.DAILY,
+        username=None,
+    ):
         self.username = username
-
-    def update_freq_mode(self, freq_mode: FreqMode):
         self.freq_mode = freq_mode
+        # indexes are created at deploy by models/migrations.py migrate_indexes
+        self.collection = holdings_collection
+        self.market_data_collection = market_data_collection
 
     def is_trash_empty(self):
         """checks if trash is empty for the current user and freq_mode"""
@@ -100,22 +304,24 @@ class RawDataList:
 
         return undo_states
 
-    def _query_5y_one_ticker(self, ticker):
+    def _query_chart(self, ticker, chart_range):
         """
-        queries 5y data from Yahoo Finance
+        queries daily chart data of the given range from Yahoo Finance
+        and returns the chart result
         """
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/113.0.0.0 Safari/537.36"
-            ),
-            "Accept": "application/json",
-            "Connection": "keep-alive",
-        }
-        url = f"{YAHOO_BASE_URL}/redacted_path/{ticker}?range=5y&interval=1d"
+        url = f"{YAHOO_BASE_URL}/redacted_path/{ticker}?range={chart_range}&interval=1d"
 
-        response = requests.get(url, headers=headers)
+        # fails fast with CircuitOpenError while the API is known to be down
+        chart_circuit_breaker.before_call()
+        try:
+            response = http_get_with_retry(url, rate_limiter=chart_rate_limiter)
+        except requests.RequestException:
+            chart_circuit_breaker.record_failure()
+            raise
+        if response.status_code in RETRY_STATUS_CODES:
+            chart_circuit_breaker.record_failure()
+        else:
+            chart_circuit_breaker.record_success()
 
         if response.status_code != 200:
             raise RuntimeError(
@@ -132,29 +338,51 @@ class RawDataList:
         if res["chart"]["error"]:
             raise RuntimeError(f"Yahoo API returned an error: {res['chart']['error']}")
 
-        # parse to raw_output
-        base = res["chart"]["result"][0]
-        raw_output = {"ticker": ticker}  # ticker is primary key
-        for row in chart_5y_df.itertuples(index=False):
-            if not row.include:
-                continue
+        return res["chart"]["result"][0]
+
+    def _query_5y_chart(self, ticker):
+        """
+        returns a chart result holding 5y of daily bars
 
+        Only the recent PRICE_HISTORY_REFRESH_RANGE is downloaded when the ticker
+        has a usable history in price_history_cache; a full 5y backfill is done
+        for new tickers, after a gap or an adjustment, and when the history is
+        older than PRICE_HISTORY_MAX_AGE.
+        """
+        history = price_history_cache.get(ticker)
+        if (
+            history is not None
+            and time.time() - history["backfilled_at"] < PRICE_HISTORY_MAX_AGE
+        ):
+            base = self._query_chart(ticker, PRICE_HISTORY_REFRESH_RANGE)
             try:
-                if pd.notna(row.api_key3):
-                    value = base[row.api_key1][row.api_key2][0][row.api_key3]
-                elif pd.notna(row.api_key2):
-                    value = base[row.api_key1][row.api_key2]
-                elif pd.notna(row.api_key1):
-                    value = base[row.api_key1]
-                else:
-                    # this won't happen unless chart_5y_df has errors
-                    raise RuntimeError("chart_5y_df has errors")
-
-                raw_output[row.field] = value
+                merged = merge_history(history, history_from_chart(base))
             except (KeyError, IndexError, TypeError):
-                # Field doesn't exist in API response, set to None
-                raw_output[row.field] = None
-                print(f"[WARNING] Missing field '{row.field}' for ticker {ticker}")
+                merged = None
+
+            if merged is not None:
+                price_history_cache.set(ticker, merged)
+                return chart_with_history(base, merged)
+
+        base = self._query_chart(ticker, "5y")
+        try:
+            price_history_cache.set(ticker, history_from_chart(base))
+        except (KeyError, IndexError, TypeError):
+            # no usable bar series, parsing below reports it
+            price_history_cache.delete(ticker)
+        return base
+
+    def _query_5y_one_ticker(self, ticker):
+        """
+        queries 5y data from Yahoo Finance
+        """
+        # parse to raw_output
+        base = self._query_5y_chart(ticker)
+        raw_output = {"ticker": ticker}  # ticker is primary key
+        values, missing = extract_chart_fields(base)
+        raw_output.update(values)
+        # Fields that don't exist in API response are None, reported once per batch
+        missing_field_log.add(ticker, missing)
 
         # clean raw_output
         raw_output["companyName"] = raw_output.get("shortName") or raw_output.get(
@@ -170,69 +398,26 @@ class RawDataList:
                 - raw_output["currentTradingPeriod"]["regular"]["start"]
             )
 
-            df = pd.DataFrame(
-                {"date": raw_output["5y_timestamp"], "price": raw_output["5y_adjclose"], "low": res['chart']['result'][0]
-                    ['indicators']['quote'][0]['low'], "high": res['chart']['result'][0]['indicators']['quote'][0]['high']}
-            )
-            # date's hour shows opening time, not closing time for all dates except latest date
-            df.at[df.index[-1], "date"] = df.at[df.index[-1], "date"] - closing_time_offset
-            df["date"] = (
-                pd.to_datetime(df["date"] + closing_time_offset, unit="s", utc=True)
-                .dt.tz_convert(raw_output["exchangeTimezoneName"])
-                .dt.tz_localize(None)
+            quote = base["indicators"]["quote"][0]
+            index = PriceWindowIndex.from_chart(
+                raw_output["5y_timestamp"],
+                raw_output["5y_adjclose"],
+                quote["low"],
+                quote["high"],
+                closing_time_offset,
+                raw_output["exchangeTimezoneName"],
             )
 
-            # fix the date for the latest date - for some tickers, latest time after hours keep increasing while the price remains at closing price. This date messes up 1D percent calculation.
-            t2 = df.iloc[-2]["date"]
-            t1 = df.iloc[-1]["date"]
-            # compare only time-of-day (ignoring date)
-            if t1.time() > t2.time():
-                # replace the time-of-day of t1 with t2's, keep the date of t1
-                new_time = pd.Timestamp.combine(t1.date(), t2.time())
-                df.at[df.index[-1], "date"] = new_time
-
-            date_prefix_map = {
-                "1D": pd.DateOffset(days=1),
-                "1W": pd.DateOffset(weeks=1),
-                "1M": pd.DateOffset(months=1),
-                "1Y": pd.DateOffset(years=1),
-                "5Y": pd.DateOffset(years=5),
-            }
-
-            latest_date = df.iloc[-1]["date"]
-            first_date = df.iloc[0]["date"]
-
-            for label, offset in date_prefix_map.items():
+            for label, offset in PERIOD_OFFSETS.items():
                 price_key = f"price{label}"
-                percent_key = f"percent{label}"
-                low_key = f"price{label}_low"
-                high_key = f"price{label}_high"
-
-                if label == "5Y":
-                    prior_date = first_date
-                else:
-                    prior_date = latest_date - offset
-
-                # Get the date range for this period
-                period_df = df[df["date"] >=
-                               prior_date] if first_date <= prior_date else pd.DataFrame()
-
-                raw_output[price_key] = (
-                    float(period_df.iloc[0]["price"])
-                    if not period_df.empty
-                    else None
-                )
-                raw_output[percent_key] = _perc_chg(
+                price, low, high = index.window_stats(index.window_start(offset))
+
+                raw_output[price_key] = price
+                raw_output[f"percent{label}"] = _perc_chg(
                     raw_output, "regularMarketPrice", price_key
                 )
-
-                # Calculate low and high for this period
-                if not period_df.empty:
-                    raw_output[low_key] = float(period_df["low"].min())
-                    raw_output[high_key] = float(period_df["high"].max())
-                else:
-                    raw_output[low_key] = None
-                    raw_output[high_key] = None
+                raw_output[f"price{label}_low"] = low
+                raw_output[f"price{label}_high"] = high
 
             raw_output["percentFromDayHigh"] = _perc_chg(
                 raw_output, "regularMarketPrice", "regularMarketDayHigh"
@@ -249,12 +434,11 @@ class RawDataList:
 
             raw_output.pop("5y_timestamp", None)
             raw_output.pop("5y_adjclose", None)
-            raw_output.pop("currentTradingPeriod", None)
 
         except (KeyError, TypeError, AttributeError) as e:
             print(f"[WARNING] Could not process time series data for {ticker}: {e}")
             # Set default values for missing fields
-            for label in ["1D", "1W", "1M", "1Y", "5Y"]:
+            for label in PERIOD_OFFSETS:
                 raw_output[f"price{label}"] = None
                 raw_output[f"percent{label}"] = None
                 raw_output[f"price{label}_low"] = None
@@ -265,30 +449,149 @@ class RawDataList:
             raw_output["percentFrom52wHigh"] = None
             raw_output["percentFrom52wLow"] = None
 
+        # stored with declared types, and with the timestamps already rendered
+        raw_output = coerce_fields(raw_output, strict=False)
+        _add_market_time_fields(raw_output)
         return raw_output
 
     def _query_one_ticker(self, ticker):
         """
         Run all api queries
+
+        The parsed output is the same for every user and freq_mode, so it is served
+        from market_data_cache while fresh; the TTL depends on whether the
+        exchange is in its regular session (see market_data_ttl). Concurrent
+        misses for the same ticker, from any thread or worker, share one fetch.
+
+        If the fetch fails (or the circuit breaker is open), the last good output
+        of the ticker is returned with a refreshError saying so, when there is one.
         """
+        cache_key = f"chart:{ticker}"
+        raw_output = market_data_cache.get(cache_key)
+        if raw_output is not None:
+            return raw_output
+
+        try:
+            return chart_single_flight.do(
+                cache_key,
+                lambda: self._fetch_one_ticker(ticker, cache_key),
+                lambda: market_data_cache.get(cache_key),
+            )
+        except Exception as e:
+            last_good = market_data_cache.get(f"chart_last_good:{ticker}")
+            if last_good is None:
+                raise
+            print(f"[WARNING] Serving last good data: {e}")
+            return {**last_good, "refreshError": f"Showing last good data: {e}"}
+
+    def _fetch_one_ticker(self, ticker, cache_key):
         try:
             five_year_output = self._query_5y_one_ticker(ticker)
         except Exception as e:
             raise RuntimeError(f"Error: {ticker}: {e}")
 
         raw_output = five_year_output.copy()
+        raw_output["fetchedAt"] = int(time.time())
+        trading_period = raw_output.pop("currentTradingPeriod", None)
+        # the session bounds let the refresh planner skip tickers whose market is closed
+        regular = (trading_period or {}).get("regular") or {}
+        raw_output["regularSessionStart"] = regular.get("start")
+        raw_output["regularSessionEnd"] = regular.get("end")
+        market_data_cache.set(
+            cache_key, raw_output, expire=market_data_ttl(trading_period)
+        )
+        # kept without expiry as the fallback while the API is unavailable
+        market_data_cache.set(f"chart_last_good:{ticker}", raw_output)
         return raw_output
 
-    def read_all(self):
+    def _query_many_tickers(self, tickers, max_workers=None):
+        """
+        Run _query_one_ticker for every ticker, using a bounded thread pool when
+        max_workers > 1 (defaults to REFRESH_MAX_WORKERS).
+
+        Returns a list in the same order as tickers. Each item is either the
+        raw_output of that ticker or the exception it raised, so that one failed
+        ticker does not abort the whole batch.
+        """
+        if max_workers is None:
+            max_workers = REFRESH_MAX_WORKERS
+
+        def query(ticker):
+            try:
+                return self._query_one_ticker(ticker)
+            except Exception as e:
+                return e
+
+        if max_workers <= 1 or len(tickers) <= 1:
+            results = [query(ticker) for ticker in tickers]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(tickers))) as executor:
+                # executor.map keeps the input order, so the result matches the serial path
+                # the pool threads count their fetches into the calling callback's metrics
+                results = list(executor.map(bind_callback_tally(query), tickers))
+
+        missing_field_log.report()
+        return results
+
+    def _join_market_data(self, query, *stages):
+        """
+        aggregation pipeline returning the holdings matching query, each merged
+        with the market_data of its ticker, followed by stages
+        """
+        return [
+            {"$match": query},
+            {
+                "$lookup": {
+                    "from": self.market_data_collection.name,
+                    "localField": "ticker",
+                    "foreignField": "ticker",
+                    "as": "market_data",
+                }
+            },
+            {
+                "$replaceRoot": {
+                    "newRoot": {
+                        "$mergeObjects": [{"$arrayElemAt": ["$market_data", 0]}, "$$ROOT"]
+                    }
+                }
+            },
+            {"$project": {"_id": 0, "market_data": 0}},
+            *stages,
+        ]
+
+    def _with_market_data(self, holding):
+        """returns the raw_data of a holding document"""
+        market_data = self.market_data_collection.find_one(
+            {"ticker": holding["ticker"]}, projection={"_id": 0}
+        )
+        return {**(market_data or {}), **holding}
+
+    def _write_market_data(self, ticker, raw_output):
+        """stores the raw_output of a ticker, clearing refreshError unless it has one"""
+        update = {"$set": raw_output}
+        if "refreshError" not in raw_output:
+            update["$unset"] = {"refreshError": ""}
+        return self.market_data_collection.find_one_and_update(
+            {"ticker": ticker},
+            update,
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def read_all(self, stages=()):
+        """raw_data of the user's tickers, followed by the aggregation stages if any"""
         raw_data_list = list(
-            self.collection.find(
-                {"username": self.username, "freq_mode": self.freq_mode},
-                projection={"_id": 0},
+            self.collection.aggregate(
+                self._join_market_data(
+                    {"username": self.username, "freq_mode": self.freq_mode}, *stages
+                )
             )
         )
         return raw_data_list
 
     def delete(self, ticker):
+        # only the holding is deleted; the market_data may serve other holders
         trash = self.collection.find_one_and_delete(
             {"username": self.username, "ticker": ticker, "freq_mode": self.freq_mode},
             projection={"_id": 0},
@@ -297,11 +600,24 @@ class RawDataList:
             raise KeyError(f"No ticker to delete: {ticker}")
 
         # Add to cache trash
-        user_cache = cache.get(self.username, {})
-        mode_trash = user_cache.get(f"mode_{self.freq_mode.value}", {}).get("trash", [])
-        mode_trash.append(trash)
-        user_cache[f"mode_{self.freq_mode.value}"] = {"trash": mode_trash}
-        cache.set(self.username, user_cache)
+        def add_to_trash(user_cache):
+            mode_trash = user_cache.get(f"mode_{self.freq_mode.value}", {}).get("trash", [])
+            mode_trash.append(trash)
+            user_cache[f"mode_{self.freq_mode.value}"] = {"trash": mode_trash}
+
+        self._update_trash(add_to_trash)
+
+    def _update_trash(self, update):
+        """
+        applies update to the user's cache entry of trash and stores it in one
+        transaction, so that concurrent requests of the user (in other modes or
+        threads) do not overwrite each other's trash. Returns what update returns.
+        """
+        with cache.transact():
+            user_cache = cache.get(self.username, {})
+            result = update(user_cache)
+            cache.set(self.username, user_cache)
+        return result
 
     def is_duplicate(self, ticker):
         """
@@ -332,6 +648,7 @@ class RawDataList:
     def append(self, user_input: dict):
         """Add new ticker to database after checking duplicates and clearing from trash"""
         # user_input won't have a username
+        user_input = coerce_fields(user_input)
         ticker = user_input["ticker"]
 
         # Check for duplicate
@@ -340,30 +657,32 @@ class RawDataList:
 
         # Remove from trash if exists in ANY mode for this user
         # Get all cache keys for this user and check each one
-        user_cache = cache.get(self.username, {})
-        for mode_key in user_cache.keys():
-            if mode_key.startswith("mode_"):
-                current_trash = user_cache[mode_key]["trash"]
-
-                # Find and remove the ticker if it exists in this mode's trash
-                for i, row in enumerate(current_trash):
-                    if row["ticker"] == ticker:
-                        current_trash.pop(i)
-                        user_cache[mode_key]["trash"] = current_trash
-                        cache.set(self.username, user_cache)
-                        break
+        def remove_from_trash(user_cache):
+            for mode_key in user_cache.keys():
+                if mode_key.startswith("mode_"):
+                    current_trash = user_cache[mode_key]["trash"]
+
+                    # Find and remove the ticker if it exists in this mode's trash
+                    for i, row in enumerate(current_trash):
+                        if row["ticker"] == ticker:
+                            current_trash.pop(i)
+                            break
+
+        self._update_trash(remove_from_trash)
 
         try:
             raw_output = self._query_one_ticker(ticker)
-            raw_data = {
+            missing_field_log.report()
+            market_data = self._write_market_data(ticker, raw_output)
+            holding = {
                 "username": self.username,
                 "freq_mode": self.freq_mode,
                 **user_input,
-                **raw_output,
             }
+            holding["positionCost"] = _position_cost(holding)
             # insert_one will mutate and add _id
-            self.collection.insert_one(raw_data.copy())
-            return raw_data
+            self.collection.insert_one(holding.copy())
+            return {**market_data, **holding}
 
         except Exception as e:
             raise RuntimeError(f"Error appending ticker {ticker}: {e}")
@@ -371,17 +690,22 @@ class RawDataList:
     def update_user_input(self, ticker, key, new_value):
         if key == "ticker":
             raise KeyError("Updating ticker is not allowed")
+        new_value = coerce_value(key, new_value)
 
+        # positionCost is recomputed in the same update
         raw_data = self.collection.find_one_and_update(
             {"username": self.username, "ticker": ticker, "freq_mode": self.freq_mode},
-            {"$set": {key: new_value}},
+            [
+                {"$set": {key: {"$literal": new_value}}},
+                {"$set": {"positionCost": POSITION_COST_EXPR}},
+            ],
             projection={"_id": 0},
             return_document=ReturnDocument.AFTER,
         )
         if raw_data is None:
             raise KeyError(f"No ticker found to update: {ticker}")
 
-        return raw_data
+        return self._with_market_data(raw_data)
 
     def update_alert_count(self, ticker, alert_count):
         raw_data = self.collection.find_one_and_update(
@@ -393,57 +717,204 @@ class RawDataList:
         if raw_data is None:
             raise KeyError(f"No ticker found to update: {ticker}")
 
-        return raw_data
+        return self._with_market_data(raw_data)
 
     def refresh_raw_output(self, ticker):
-        raw_data = self.collection.find_one_and_delete(
+        """
+        Re-queries one ticker and writes the fetched fields back. If the fetch
+        fails, the stored market data is kept and only gets a refreshError.
+        """
+        holding = self.collection.find_one(
             {"username": self.username, "ticker": ticker, "freq_mode": self.freq_mode},
             projection={"_id": 0},
         )
+        if holding is None:
+            raise KeyError(f"No ticker found to refresh: {ticker}")
 
         try:
             raw_output = self._query_one_ticker(ticker)
-            raw_data.update(raw_output)
-            self.collection.insert_one(raw_data.copy())
-            return raw_data
-
+            missing_field_log.report()
         except Exception as e:
-            raise RuntimeError(f"Error updating ticker {ticker}: {e}")
+            print(f"[WARNING] Refresh failed, keeping stored values: {e}")
+            raw_output = {"refreshError": str(e)}
 
-    def refresh_all(self):
-        raw_data_list = self.read_all()
+        # only the fetched fields are written; user inputs stay untouched
+        market_data = self._write_market_data(ticker, raw_output)
+        return {**market_data, **holding}
+
+    def _bulk_update(self, updates, batch_size=None):
+        """
+        Applies {ticker: update document} to the market_data of the tickers as
+        unordered bulk_write batches of UpdateOne (upserting), batch_size
+        operations per round trip.
+
+        Returns {ticker: error message or None}. A rejected operation or a failed
+        batch only marks its own tickers; the other writes still go through.
+        """
+        batch_size = batch_size or REFRESH_WRITE_BATCH_SIZE
+        items = list(updates.items())
+        results = {}
+        for start in range(0, len(items), batch_size):
+            batch = items[start : start + batch_size]
+            operations = [
+                UpdateOne({"ticker": ticker}, update, upsert=True)
+                for ticker, update in batch
+            ]
+            try:
+                self.market_data_collection.bulk_write(operations, ordered=False)
+                errors = {}
+            except BulkWriteError as e:
+                # writeErrors indexes are relative to this batch
+                errors = {
+                    error["index"]: error.get("errmsg", "write failed")
+                    for error in e.details.get("writeErrors", [])
+                }
+            except PyMongoError as e:
+                errors = {i: str(e) for i in range(len(batch))}
+
+            for i, (ticker, _) in enumerate(batch):
+                results[ticker] = errors.get(i)
+        return results
+
+    def _refresh_chunk(self, raw_data_list, max_workers=None):
+        """
+        Re-queries the tickers of raw_data_list that refresh_planner says may have
+        changed, writes the fetched fields back in bulk updates of
+        REFRESH_WRITE_BATCH_SIZE and returns (rows in the same order, number of
+        tickers skipped by the planner).
+
+        A ticker that fails keeps its last stored values and gets a refreshError
+        message on its own row; the other tickers are still refreshed.
+        """
+        to_fetch, to_skip = refresh_planner.plan(raw_data_list)
+        tickers = [raw_data["ticker"] for raw_data in to_fetch]
+        results = dict(zip(tickers, self._query_many_tickers(tickers, max_workers)))
 
         new_data_list = []
-        for i, raw_data in enumerate(raw_data_list):
+        updates = {}
+        for raw_data in raw_data_list:
             ticker = raw_data["ticker"]
-            new_raw_data = self._query_one_ticker(ticker)
-            raw_data_list[i] = {**raw_data, **new_raw_data}
-            new_data_list.append(raw_data_list[i].copy())
+            result = results.get(ticker)
+            if ticker not in results:
+                new_data = dict(raw_data)
+            elif isinstance(result, Exception):
+                print(f"[WARNING] Refresh failed, keeping stored values: {result}")
+                new_data = {**raw_data, "refreshError": str(result)}
+                updates[ticker] = {"$set": {"refreshError": str(result)}}
+            elif "refreshError" in result:
+                # last good data served in place of a failed fetch
+                new_data = {**raw_data, **result}
+                updates[ticker] = {"$set": result}
+            else:
+                new_data = {**raw_data, **result}
+                new_data.pop("refreshError", None)
+                updates[ticker] = {"$set": result, "$unset": {"refreshError": ""}}
+            new_data_list.append(new_data)
+
+        write_errors = self._bulk_update(updates, REFRESH_WRITE_BATCH_SIZE)
+        for new_data in new_data_list:
+            error = write_errors.get(new_data["ticker"])
+            if error:
+                print(f"[WARNING] Write failed for {new_data['ticker']}: {error}")
+                new_data["refreshError"] = f"Write failed: {error}"
+
+        return new_data_list, len(to_skip)
+
+    def is_stale(self, raw_data, now=None):
+        """
+        True if raw_data was fetched longer ago than the freq_mode's FRESHNESS_TTL
+        and its market has opened since (see refresh_planner)
+        """
+        now = time.time() if now is None else now
+        fetched_at = raw_data.get("fetchedAt")
+        if fetched_at is not None and fetched_at >= now - FRESHNESS_TTL[self.freq_mode]:
+            return False
+        return refresh_planner.needs_refresh(raw_data, now)
 
-        self.collection.delete_many(
-            {"username": self.username, "freq_mode": self.freq_mode}
+    def iter_refresh(self, max_workers=None, batch_size=None, stale_only=False):
+        """
+        Re-query every ticker for the current user and freq_mode (only those
+        past their FRESHNESS_TTL if stale_only), yielding the refreshed rows as
+        each batch completes.
+
+        Rows are read from a cursor batch_size at a time (defaults to
+        REFRESH_WRITE_BATCH_SIZE); each batch is fetched concurrently, written
+        back to market_data in bulk updates and yielded before the next one is
+        read, so memory stays flat however many tickers the user has. Only market
+        data is written, so user inputs edited meanwhile are kept and no row is
+        ever missing from the collection.
+        """
+        batch_size = batch_size or REFRESH_WRITE_BATCH_SIZE
+        stages = []
+        if stale_only:
+            cutoff = time.time() - FRESHNESS_TTL[self.freq_mode]
+            stages.append(
+                {
+                    "$match": {
+                        "$or": [
+                            {"fetchedAt": {"$lt": cutoff}},
+                            {"fetchedAt": {"$exists": False}},
+                        ]
+                    }
+                }
+            )
+        cursor = self.collection.aggregate(
+            self._join_market_data(
+                {"username": self.username, "freq_mode": self.freq_mode}, *stages
+            ),
+            batchSize=batch_size,
         )
+        total = skipped = 0
+        try:
+            for raw_data_list in iter(lambda: list(islice(cursor, batch_size)), []):
+                new_data_list, chunk_skipped = self._refresh_chunk(raw_data_list, max_workers)
+                total += len(new_data_list)
+                skipped += chunk_skipped
+                yield from new_data_list
+        finally:
+            cursor.close()
+
+        if skipped:
+            print(
+                f"Refresh skipped {skipped} of {total} tickers "
+                "whose market has been closed since their last fetch"
+            )
 
-        # Only insert if there are documents to insert
-        if raw_data_list:
-            self.collection.insert_many(raw_data_list)
-
-        return new_data_list
+    def refresh_all(self, max_workers=None, batch_size=None):
+        """iter_refresh collected into a list"""
+        return list(self.iter_refresh(max_workers, batch_size))
 
     def restore(self):
-        user_cache = cache.get(self.username, {})
-        mode_trash = user_cache.get(f"mode_{self.freq_mode.value}", {}).get("trash", [])
-        if not mode_trash:
-            raise IndexError("Trash is empty")
-
-        raw_data = mode_trash.pop()
-        self.collection.insert_one(raw_data.copy())
+        mode_key = f"mode_{self.freq_mode.value}"
+
+        def pop_from_trash(user_cache):
+            mode_trash = user_cache.get(mode_key, {}).get("trash", [])
+            if not mode_trash:
+                raise IndexError("Trash is empty")
+            raw_data = mode_trash.pop()
+            user_cache[mode_key] = {"trash": mode_trash}
+            return raw_data
 
-        # Update the cache with the modified trash list
-        user_cache[f"mode_{self.freq_mode.value}"] = {"trash": mode_trash}
-        cache.set(self.username, user_cache)
+        raw_data = self._update_trash(pop_from_trash)
+        # trash saved before holdings were split out holds a full raw_data
+        holding = {
+            key: value
+            for key, value in raw_data.items()
+            if key in HOLDING_KEYS or key in USER_INPUT_FIELDS
+        }
+        holding["positionCost"] = _position_cost(holding)
+        try:
+            self.collection.insert_one(holding.copy())
+        except Exception:
+            # put it back so the undo can be retried
+            self._update_trash(
+                lambda user_cache: user_cache.setdefault(mode_key, {"trash": []})[
+                    "trash"
+                ].append(raw_data)
+            )
+            raise
 
-        return raw_data
+        return self._with_market_data(holding)
 
 
 class DataList:
@@ -452,18 +923,18 @@ class DataList:
     It starts from RawDataList and adds calculated fields
     """
 
-    def __init__(self, raw_data_collection, freq_mode: FreqMode = FreqMode.DAILY):
-        self.username = None
-        self.freq_mode = freq_mode
-        self.rdl = RawDataList(raw_data_collection, freq_mode)
-
-    def update_username(self, username):
+    def __init__(
+        self,
+        holdings_collection,
+        market_data_collection,
+        freq_mode: FreqMode = FreqMode.DAILY,
+        username=None,
+    ):
         self.username = username
-        self.rdl.update_username(username)
-
-    def update_freq_mode(self, freq_mode: FreqMode):
         self.freq_mode = freq_mode
-        self.rdl.update_freq_mode(freq_mode)
+        self.rdl = RawDataList(
+            holdings_collection, market_data_collection, freq_mode, username
+        )
 
     def is_trash_empty(self):
         """checks if trash is empty for the current user and freq_mode"""
@@ -476,82 +947,83 @@ class DataList:
     def is_duplicate(self, ticker):
         return self.rdl.is_duplicate(ticker)
 
-    def _mutate_data_on_5y(self, data):
-        """mutates data"""
-        data["ipo"] = (
-            pd.to_datetime(data["firstTradeDate"], unit="s", utc=True)
-            .tz_convert(data["exchangeTimezoneName"])
-            .strftime("%Y/%m/%d")
-        )
-        data.pop("firstTradeDate", None)
-
-        data["latestMarketTimeWithTimeZone"] = (
-            pd.to_datetime(data["regularMarketTime"], unit="s", utc=True)
-            .tz_convert(data["exchangeTimezoneName"])
-            .strftime("%Y/%m/%d %I:%M %p")
-            + f" ({data.get('timezone')})"
-        )
-
-        data.pop("regularMarketTime", None)
-        data.pop("exchangeTimezoneName", None)
-        data.pop("timezone", None)
-
-    def _mutate_data_on_user(self, data):
-        data["percentFromUpperTarget"] = _perc_chg(
-            data, "regularMarketPrice", "priceUpperTarget"
-        )
-        data["percentFromLowerTarget"] = _perc_chg(
-            data, "regularMarketPrice", "priceLowerTarget"
+    def _mutate_data_list_on_user(self, data_list):
+        """
+        sets the DISPLAY_STAGES fields of every data of data_list, with the
+        arithmetic done on float64 columns. Values float64 cannot reproduce exactly
+        (int * int products, ints past 2**53, zero or non-numeric denominators)
+        are computed row by row, so the result is the same as Python's.
+        """
+        price = _numeric_column(data_list, "regularMarketPrice")
+        upper = _numeric_column(data_list, "priceUpperTarget")
+        lower = _numeric_column(data_list, "priceLowerTarget")
+        buy_price = _numeric_column(data_list, "averageBuyPrice")
+        quantity = _numeric_column(data_list, "positionQuantity")
+        cost_values, cost_kinds = _numeric_column(data_list, "positionCost")
+
+        from_upper = _perc_chg_column(
+            data_list, price, upper, "regularMarketPrice", "priceUpperTarget"
         )
-        data["positionCost"] = (
-            data["averageBuyPrice"] * data["positionQuantity"]
-            if all(
-                isinstance(data.get(k), (int, float))
-                for k in ["averageBuyPrice", "positionQuantity"]
-            )
-            else None
+        from_lower = _perc_chg_column(
+            data_list, price, lower, "regularMarketPrice", "priceLowerTarget"
         )
-        data["positionFMV"] = (
-            data["regularMarketPrice"] * data["positionQuantity"]
-            if all(
-                isinstance(data.get(k), (int, float))
-                for k in ["regularMarketPrice", "positionQuantity"]
-            )
-            else None
+        position_return = _perc_chg_column(
+            data_list, price, buy_price, "regularMarketPrice", "averageBuyPrice"
         )
-        data["unrealizedGainLoss"] = (
-            data["positionFMV"] - data["positionCost"]
-            if all(
-                isinstance(data.get(k), (int, float))
-                for k in ["positionFMV", "positionCost"]
+        fmv, fmv_exact, fmv_numeric = _product_column(price, quantity)
+        with np.errstate(all="ignore"):
+            gain = (np.array(fmv, dtype=float) - cost_values).tolist()
+        gain_exact = fmv_exact & (cost_kinds <= _INT)
+
+        for i in np.flatnonzero(~fmv_exact & fmv_numeric):
+            data = data_list[i]
+            fmv[i] = data["regularMarketPrice"] * data["positionQuantity"]
+        for i in np.flatnonzero(~gain_exact):
+            cost = data_list[i].get("positionCost")
+            gain[i] = (
+                fmv[i] - cost
+                if all(isinstance(v, (int, float)) for v in (fmv[i], cost))
+                else None
             )
-            else None
-        )
-        data["positionReturn"] = _perc_chg(
-            data, "regularMarketPrice", "averageBuyPrice"
-        )
 
-    def read_all(self):
-        data_list = self.rdl.read_all()
+        for data, *fields in zip(
+            data_list, from_upper, from_lower, fmv, gain, position_return
+        ):
+            (
+                data["percentFromUpperTarget"],
+                data["percentFromLowerTarget"],
+                data["positionFMV"],
+                data["unrealizedGainLoss"],
+                data["positionReturn"],
+            ) = fields
+
+    def _mutate_data_list(self, data_list):
+        """
+        turns raw_data just written (and so not read through DISPLAY_STAGES) into
+        DataList rows
+        """
+        if data_list:
+            self._mutate_data_list_on_user(data_list)
         for data in data_list:
-            self._mutate_data_on_5y(data)
-            self._mutate_data_on_user(data)
-        return data_list
+            for field in MARKET_SOURCE_FIELDS:
+                data.pop(field, None)
+
+    def read_all(self):
+        # derived fields are stored or computed by the query; nothing is left to do here
+        return self.rdl.read_all(DISPLAY_STAGES)
 
     def delete(self, ticker):
         self.rdl.delete(ticker)
 
     def append(self, user_input: dict):
         data = self.rdl.append(user_input)
-        self._mutate_data_on_5y(data)
-        self._mutate_data_on_user(data)
+        self._mutate_data_list([data])
 
         return data
 
     def update_user_input(self, ticker, key, new_value):
         data = self.rdl.update_user_input(ticker, key, new_value)
-        # Note: not executing self._mutate_data_on_5y(data)
-        self._mutate_data_on_user(data)
+        self._mutate_data_list([data])
         return data
 
     def update_alert_count(self, ticker, alert_count):
@@ -560,21 +1032,27 @@ class DataList:
 
     def refresh_one_ticker(self, ticker):
         data = self.rdl.refresh_raw_output(ticker)
-        self._mutate_data_on_5y(data)
-        self._mutate_data_on_user(data)
+        self._mutate_data_list([data])
         return data
 
-    def refresh_all(self):
-        data_list = self.rdl.refresh_all()
-        for data in data_list:
-            self._mutate_data_on_5y(data)
-            self._mutate_data_on_user(data)
-        return data_list
+    def is_stale(self, data, now=None):
+        return self.rdl.is_stale(data, now)
+
+    def iter_refresh(self, max_workers=None, batch_size=None, stale_only=False):
+        batch_size = batch_size or REFRESH_WRITE_BATCH_SIZE
+        rows = self.rdl.iter_refresh(max_workers, batch_size, stale_only)
+        # rdl yields each refreshed batch in full, so taking batch_size rows at a
+        # time never waits on the next batch's fetch
+        for data_list in iter(lambda: list(islice(rows, batch_size)), []):
+            self._mutate_data_list(data_list)
+            yield from data_list
+
+    def refresh_all(self, max_workers=None, batch_size=None):
+        return list(self.iter_refresh(max_workers, batch_size))
 
     def restore_latest_ticker(self):
         data = self.rdl.restore()
-        self._mutate_data_on_5y(data)
-        self._mutate_data_on_user(data)
+        self._mutate_data_list([data])
         return data
 
 
@@ -601,22 +1079,13 @@ class AlertList:
             but will have a specific date if it is triggered
     """
 
-    def __init__(self, alert_data_collection, freq_mode: FreqMode = FreqMode.DAILY):
-        self.username = None
-        self.freq_mode = freq_mode
-        self.collection = alert_data_collection
-
-        # Create index for faster queries - now includes freq_mode
-        self.collection.create_index(
-            [("username", 1), ("ticker", 1), ("freq_mode", 1), ("created_time", 1)],
-            unique=True,
-        )
-
-    def update_username(self, username):
+    def __init__(
+        self, alert_data_collection, freq_mode: FreqMode = FreqMode.DAILY, username=None
+    ):
         self.username = username
-
-    def update_freq_mode(self, freq_mode: FreqMode):
         self.freq_mode = freq_mode
+        # indexes are created at deploy by models/migrations.py migrate_indexes
+        self.collection = alert_data_collection
 
     def read(self, ticker):
         """returns all the alerts for a user and ticker"""
@@ -642,6 +1111,26 @@ class AlertList:
         )
         return alert_data_list
 
+    def read_untriggered(self):
+        """returns the user's alerts that have not been triggered yet"""
+        alert_data_list = list(
+            self.collection.find(
+                {
+                    "username": self.username,
+                    "freq_mode": self.freq_mode,
+                    # as stored by append; matches the partial untriggered index
+                    "triggered_date": {"$type": "null"},
+                }
+            )
+        )
+        return alert_data_list
+
+    def read_tickers(self):
+        """returns the tickers the user has alerts on"""
+        return self.collection.distinct(
+            "ticker", {"username": self.username, "freq_mode": self.freq_mode}
+        )
+
     def delete_one_alert(self, alert_id):
         """
         Deletes the alert with the specified alert_id (MongoDB _id as string)
@@ -734,29 +1223,21 @@ class AlertList:
         return result.deleted_count
 
 
-_data_list = None
-
-
-def get_data_list(freq_mode: FreqMode = FreqMode.DAILY):
-    """Get or create global DataList instance for the specified frequency mode"""
-    global _data_list
-    if _data_list is None:
-        _data_list = DataList(raw_data_collection, freq_mode)
-    else:
-        # Update freq_mode if it's different
-        _data_list.update_freq_mode(freq_mode)
-    return _data_list
-
-
-_alert_list = None
-
-
-def get_alert_list(freq_mode: FreqMode = FreqMode.DAILY):
-    """Get or create global AlertList instance for the specified frequency mode"""
-    global _alert_list
-    if _alert_list is None:
-        _alert_list = AlertList(alert_data_collection, freq_mode)
-    else:
-        # Update freq_mode if it's different
-        _alert_list.update_freq_mode(freq_mode)
-    return _alert_list
+def get_data_list(freq_mode: FreqMode = FreqMode.DAILY, username=None):
+    """
+    Returns a new DataList of username (default: the logged-in user of the
+    current callback) for freq_mode. Instances are cheap and never shared, so
+    concurrent callbacks cannot change each other's user or mode.
+    """
+    if username is None:
+        username = current_username()
+    # the database of this process's client; see models/database.py
+    mongodb = get_db_connection()
+    return DataList(mongodb["holdings"], mongodb["market_data"], freq_mode, username)
+
+
+def get_alert_list(freq_mode: FreqMode = FreqMode.DAILY, username=None):
+    """Returns a new AlertList of username, as get_data_list does"""
+    if username is None:
+        username = current_username()
+    return AlertList(get_db_connection()["alert_data"], freq_mode, username)
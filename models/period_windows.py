@@ -0,0 +1,150 @@
+"""
+Lookback window statistics of a ticker's daily bars: the price at the start of a
+window and the lowest low / highest high over it.
+
+Bars are kept as sorted int64 exchange-local timestamps (seconds), so a window
+start is found by binary search. Every window ends at the latest bar, so suffix
+min/max arrays give the low and high of any window in O(1). UTC offsets come
+from a per-timezone transition table built once, instead of a pandas tz_convert
+for every ticker.
+
+The windows themselves are configured in the period_windows sheet of
+input_column_definitions.xlsx.
+"""
+
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pytz
+from dateutil.relativedelta import relativedelta
+
+from utils.reference import INPUT_FIELDS_FILE_PATH
+
+DAY = 24 * 60 * 60
+_EPOCH = datetime(1970, 1, 1)
+
+# window offset meaning "since Jan 1 of the latest bar's year"
+YTD = "ytd"
+
+WINDOW_UNITS = ("days", "weeks", "months", "years", "ytd", "max")
+
+
+def _window_offset(label, unit, n):
+    """returns how far back the window starts from the latest bar (None = whole series)"""
+    if unit not in WINDOW_UNITS:
+        raise ValueError(f"period_windows: unknown unit '{unit}' for {label}")
+    if unit == "max":
+        return None
+    if unit == "ytd":
+        return YTD
+    if pd.isna(n) or int(n) <= 0:
+        raise ValueError(f"period_windows: {label} needs a positive n")
+    return relativedelta(**{unit: int(n)})
+
+
+# Lookback windows, each producing price<label>, percent<label>,
+# price<label>_low and price<label>_high
+period_windows_df = pd.read_excel(INPUT_FIELDS_FILE_PATH, sheet_name="period_windows")
+
+# label -> window offset, e.g. "3M" -> relativedelta(months=3)
+PERIOD_OFFSETS = {
+    row.label: _window_offset(row.label, row.unit, row.n)
+    for row in period_windows_df.itertuples(index=False)
+}
+
+
+def _to_seconds(dt):
+    return (dt - _EPOCH) // timedelta(seconds=1)
+
+
+@lru_cache(maxsize=None)
+def _utc_offset_table(tz_name):
+    """returns (utc start of each offset period, utc offset in seconds) for a timezone"""
+    tz = pytz.timezone(tz_name or "UTC")
+    transitions = getattr(tz, "_utc_transition_times", None)
+    if not transitions:
+        offset = tz.utcoffset(datetime(2000, 1, 1))
+        return (
+            np.array([np.iinfo(np.int64).min], dtype=np.int64),
+            np.array([int(offset.total_seconds())], dtype=np.int64),
+        )
+
+    starts = np.array([_to_seconds(t) for t in transitions], dtype=np.int64)
+    offsets = np.array(
+        [int(info[0].total_seconds()) for info in tz._transition_info], dtype=np.int64
+    )
+    return starts, offsets
+
+
+def to_local_seconds(utc_seconds, tz_name):
+    """converts utc epoch seconds to naive exchange-local epoch seconds"""
+    starts, offsets = _utc_offset_table(tz_name)
+    idx = np.searchsorted(starts, utc_seconds, side="right") - 1
+    return utc_seconds + offsets[np.maximum(idx, 0)]
+
+
+class PriceWindowIndex:
+    """
+    Precomputed index over one ticker's daily bars.
+
+    dates are naive exchange-local seconds at the close of each bar, in
+    ascending order; price, low and high are float arrays (NaN for missing).
+    """
+
+    def __init__(self, dates, price, low, high):
+        if not (len(dates) == len(price) == len(low) == len(high)):
+            raise ValueError("All arrays must be of the same length")
+
+        self.dates = dates
+        self.price = price
+        # suffix_low[i] = min(low[i:]), ignoring NaN like pandas .min() does
+        self.suffix_low = np.fmin.accumulate(low[::-1])[::-1]
+        self.suffix_high = np.fmax.accumulate(high[::-1])[::-1]
+
+    @classmethod
+    def from_chart(cls, timestamps, price, low, high, closing_time_offset, tz_name):
+        """
+        builds the index from the raw chart series
+
+        timestamps show the opening time of each bar, except the latest one, so
+        closing_time_offset is added to all but the latest bar.
+        """
+        utc = np.asarray(timestamps, dtype=np.int64)
+        utc = utc + closing_time_offset
+        utc[-1] -= closing_time_offset
+        dates = to_local_seconds(utc, tz_name)
+
+        # for some tickers the time of the latest bar keeps increasing after hours
+        # while the price stays at the close; use the time-of-day of the bar before
+        last_time, prior_time = dates[-1] % DAY, dates[-2] % DAY
+        if last_time > prior_time:
+            dates[-1] += prior_time - last_time
+
+        return cls(
+            dates,
+            np.asarray(price, dtype=np.float64),
+            np.asarray(low, dtype=np.float64),
+            np.asarray(high, dtype=np.float64),
+        )
+
+    def window_start(self, offset):
+        """returns the local time a window of the given offset starts at"""
+        if offset is None:
+            return int(self.dates[0])
+        latest = _EPOCH + timedelta(seconds=int(self.dates[-1]))
+        if offset == YTD:
+            return _to_seconds(datetime(latest.year, 1, 1))
+        return _to_seconds(latest - offset)
+
+    def window_stats(self, start):
+        """
+        returns (price of the first bar, lowest low, highest high) over the bars
+        dated on or after start, or Nones if the series begins after start
+        """
+        if self.dates[0] > start:
+            return None, None, None
+
+        i = int(np.searchsorted(self.dates, start, side="left"))
+        return float(self.price[i]), float(self.suffix_low[i]), float(self.suffix_high[i])
@@ -0,0 +1,87 @@
+"""
+Local daily bar history per ticker.
+
+A full 5y chart is only downloaded for a new ticker (or after a gap, a price
+adjustment or when the history gets old). Other refreshes download a short
+recent range and merge its bars into the stored history.
+"""
+
+import time
+from datetime import datetime, timezone
+
+from dateutil.relativedelta import relativedelta
+
+SERIES_KEYS = ("timestamp", "adjclose", "low", "high")
+
+
+def history_from_chart(base, backfilled_at=None):
+    """extracts the daily bar series of a chart result into a history dict"""
+    quote = base["indicators"]["quote"][0]
+    return {
+        "timestamp": list(base["timestamp"]),
+        "adjclose": list(base["indicators"]["adjclose"][0]["adjclose"]),
+        "low": list(quote["low"]),
+        "high": list(quote["high"]),
+        "backfilled_at": backfilled_at or time.time(),
+    }
+
+
+def chart_with_history(base, history):
+    """returns a copy of the chart result whose bar series are taken from history"""
+    return {
+        **base,
+        "timestamp": history["timestamp"],
+        "indicators": {
+            **base["indicators"],
+            "quote": [{"low": history["low"], "high": history["high"]}],
+            "adjclose": [{"adjclose": history["adjclose"]}],
+        },
+    }
+
+
+def _same_price(a, b):
+    if a is None or b is None:
+        return a is b
+    return abs(a - b) <= 1e-6 * max(abs(a), abs(b), 1.0)
+
+
+def merge_history(history, recent):
+    """
+    Merges the bars of recent (a short-range history) into history.
+
+    Bars of history from the first recent timestamp onwards are replaced by the
+    recent ones, which also replaces the intraday bar of the previous refresh.
+
+    Returns None when a full backfill is needed instead:
+        - recent does not overlap history (the ticker was not refreshed for longer
+          than the recent range)
+        - a bar present in both has a different adjusted close (split or dividend)
+    """
+    if not history["timestamp"] or not recent["timestamp"]:
+        return None
+
+    first_recent = recent["timestamp"][0]
+    if history["timestamp"][-1] < first_recent:
+        return None
+
+    # the last stored bar may be an intraday bar, so it is not used for the check
+    stored = dict(zip(history["timestamp"][:-1], history["adjclose"][:-1]))
+    for ts, adjclose in zip(recent["timestamp"], recent["adjclose"]):
+        if ts in stored and not _same_price(stored[ts], adjclose):
+            return None
+
+    keep = next(
+        (i for i, ts in enumerate(history["timestamp"]) if ts >= first_recent),
+        len(history["timestamp"]),
+    )
+    merged = {key: history[key][:keep] + recent[key] for key in SERIES_KEYS}
+
+    # keep the same 5 year span a full range=5y query would return
+    latest = datetime.fromtimestamp(merged["timestamp"][-1], tz=timezone.utc)
+    cutoff = (latest - relativedelta(years=5)).timestamp()
+    start = next(i for i, ts in enumerate(merged["timestamp"]) if ts >= cutoff)
+    if start:
+        merged = {key: merged[key][start:] for key in SERIES_KEYS}
+
+    merged["backfilled_at"] = history["backfilled_at"]
+    return merged
@@ -1,10 +1,59 @@
 """Cache setup module for managing disk-based caching and background callbacks"""
 
+import uuid
+
 import diskcache
 from dash import DiskcacheManager
+from utils.reference import (
+    CACHE_DIR,
+    MARKET_DATA_CACHE_SIZE_LIMIT,
+    PRICE_HISTORY_CACHE_SIZE_LIMIT,
+)
 
 # Initialize disk-based cache for temporary data storage
-cache = diskcache.Cache("./.cache")
+cache = diskcache.Cache(CACHE_DIR / ".cache")
+
+
+class PerJobDiskcacheManager(DiskcacheManager):
+    """
+    Dash keys a background job's progress and result by the callback and its
+    arguments, so concurrent jobs with the same arguments (revalidate_stale_rows
+    of two users, say) would read each other's output. Results are never reused
+    (no cache_by), so every job gets a key of its own.
+    """
+
+    def build_cache_key(self, fn, args, cache_args_to_ignore, triggered):
+        key = super().build_cache_key(fn, args, cache_args_to_ignore, triggered)
+        return f"{key}-{uuid.uuid4().hex}"
+
+    def make_job_fn(self, fn, progress, key=None):
+        # imported here: utils.metrics keeps its histograms in metrics_cache below
+        from utils.metrics import measure_callback
+
+        # the job runs in a process of its own, away from the request that
+        # started it, so it is measured there
+        return super().make_job_fn(measure_callback(fn), progress, key)
+
 
 # Background callback manager for long-running operations
-background_callback_manager = DiskcacheManager(cache)
+background_callback_manager = PerJobDiskcacheManager(cache)
+
+# Parsed market data keyed by ticker, shared by every user, mode and gunicorn worker.
+# Kept apart from cache so that logging out (cache.clear()) does not drop it.
+market_data_cache = diskcache.Cache(
+    CACHE_DIR / ".cache_market_data",
+    size_limit=MARKET_DATA_CACHE_SIZE_LIMIT,
+    eviction_policy="least-recently-used",
+)
+
+# Daily bar history per ticker (models/price_history.py), so that refreshes only
+# download recent bars instead of the full 5 years
+price_history_cache = diskcache.Cache(
+    CACHE_DIR / ".cache_price_history",
+    size_limit=PRICE_HISTORY_CACHE_SIZE_LIMIT,
+    eviction_policy="least-recently-used",
+)
+
+# Per-callback histograms served on /metrics (utils/metrics.py), added to by every
+# gunicorn worker and background callback process
+metrics_cache = diskcache.Cache(CACHE_DIR / ".cache_metrics")
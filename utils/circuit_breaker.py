@@ -0,0 +1,113 @@
+"""
+Circuit breaker shared by every thread and gunicorn worker.
+
+After failure_threshold consecutive upstream failures the circuit opens and
+calls fail fast with CircuitOpenError instead of waiting on a dead API. Once
+reset_timeout has passed, a single caller across all workers is let through as
+a half-open probe: its success closes the circuit, its failure opens it again.
+The state lives in a diskcache entry updated in transactions.
+"""
+
+import threading
+import time
+
+from utils.reference import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        cache,
+        key,
+        failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout=CIRCUIT_RESET_TIMEOUT,
+    ):
+        self.cache = cache
+        self.key = f"circuit_breaker:{key}"
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._stats = {"rejected": 0, "opened": 0, "probes": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _get(self):
+        return self.cache.get(self.key, {"failures": 0, "opened_at": None, "probing": False})
+
+    def before_call(self):
+        """raises CircuitOpenError unless the call may go ahead (closed, or the probe)"""
+        with self.cache.transact():
+            state = self._get()
+            if state["opened_at"] is None:
+                return
+            # a probe restarts the timer, so while it is out everyone else is
+            # rejected; one that never reported back (its worker or background
+            # job died) is given up on after another reset_timeout, and the
+            # next caller becomes the probe
+            elapsed = time.time() - state["opened_at"]
+            if elapsed >= self.reset_timeout:
+                state["probing"] = True
+                state["opened_at"] = time.time()
+                self.cache.set(self.key, state)
+                self._count("probes")
+                return
+
+        self._count("rejected")
+        raise CircuitOpenError(
+            f"Circuit open after {state['failures']} upstream failures; "
+            f"retrying in {max(self.reset_timeout - elapsed, 0):.0f}s"
+        )
+
+    def record_success(self):
+        if self.key in self.cache:
+            self.cache.delete(self.key)
+
+    def record_failure(self):
+        with self.cache.transact():
+            state = self._get()
+            state["failures"] += 1
+            if state["probing"] or (
+                state["opened_at"] is None and state["failures"] >= self.failure_threshold
+            ):
+                state["opened_at"] = time.time()
+                state["probing"] = False
+                self._count("opened")
+            self.cache.set(self.key, state)
+
+    def state(self):
+        state = self._get()
+        if state["opened_at"] is None:
+            return CLOSED
+        return HALF_OPEN if state["probing"] else OPEN
+
+    def get_stats(self):
+        """
+        Returns the shared state and this process's counts since start (or since
+        reset_stats):
+            state: closed, open or half-open
+            failures: consecutive upstream failures
+            rejected: calls failed fast while open
+            opened: times this process opened the circuit
+            probes: half-open probes let through by this process
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["state"] = self.state()
+        stats["failures"] = self._get()["failures"]
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = 0
@@ -0,0 +1,186 @@
+"""
+Process-wide HTTP client for the Yahoo Finance chart and search endpoints.
+
+All outbound calls go through one requests.Session so that TCP/TLS connections
+are kept alive and reused instead of being re-established for every ticker and
+every autocomplete keystroke.
+"""
+
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from utils.metrics import record_upstream_fetch
+from utils.reference import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_BASE,
+    HTTP_BACKOFF_MAX,
+)
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/113.0.0.0 Safari/537.36"
+    ),
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "new_connections": 0, "throttled": 0, "retries": 0}
+
+# responses worth retrying: throttled or a transient server error
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count("new_connections")
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count("new_connections")
+        return super()._new_conn()
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools count every new (handshaking) connection"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns the shared requests.Session, creating it on first use.
+    A forked child process gets its own session instead of sharing sockets.
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                session = requests.Session()
+                adapter = _PooledAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    pool_block=True,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+                _session_pid = os.getpid()
+    return _session
+
+
+def http_get(url, headers=None, timeout=None):
+    """GET url through the shared session with connect/read timeouts"""
+    _count("requests")
+    record_upstream_fetch()
+    return get_session().get(
+        url,
+        headers=headers,
+        timeout=timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+    )
+
+
+def _retry_after(response):
+    """returns the Retry-After header in seconds, or None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def http_get_with_retry(url, rate_limiter=None, max_retries=None, headers=None, timeout=None):
+    """
+    http_get behind an optional RateLimiter (utils/rate_limiter.py), retrying
+    429 and 5xx responses up to max_retries times (defaults to HTTP_MAX_RETRIES).
+
+    A retry waits for Retry-After when the server sends it, otherwise for an
+    exponential backoff with full jitter, in both cases for at most
+    HTTP_BACKOFF_MAX. A 429 also empties the rate limiter's bucket for that
+    long, so the other threads and workers back off too.
+    Returns the last response when retries are exhausted.
+    """
+    if max_retries is None:
+        max_retries = HTTP_MAX_RETRIES
+
+    attempt = 0
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        response = http_get(url, headers=headers, timeout=timeout)
+        if response.status_code not in RETRY_STATUS_CODES or attempt >= max_retries:
+            return response
+
+        wait = _retry_after(response)
+        if wait is None:
+            wait = random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2**attempt))
+        else:
+            # a Retry-After of an hour must not hold a callback or refresh thread,
+            # nor the other workers through the rate limiter, for that long
+            wait = min(wait, HTTP_BACKOFF_MAX)
+        if response.status_code == 429:
+            _count("throttled")
+            if rate_limiter is not None:
+                rate_limiter.penalize(wait)
+        _count("retries")
+        attempt += 1
+        time.sleep(wait)
+
+
+def get_http_stats():
+    """
+    Returns request counts since start (or since reset_http_stats):
+        requests: number of http_get calls
+        new_connections: connections opened, each paying a TCP (+TLS) handshake
+        reused_connections: requests served on an already open connection
+        throttled: 429 responses that were retried
+        retries: retried requests (throttled or 5xx)
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["reused_connections"] = max(stats["requests"] - stats["new_connections"], 0)
+    return stats
+
+
+def reset_http_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,135 @@
+"""Market session helpers built on the currentTradingPeriod returned by the chart API"""
+
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytz
+
+from utils.reference import (
+    INPUT_FIELDS_FILE_PATH,
+    MARKET_DATA_TTL_OPEN,
+    MARKET_DATA_TTL_CLOSED,
+    REFRESH_SETTLE_GRACE,
+)
+
+DAY = 24 * 60 * 60
+
+# Exchange holidays (full-day closures), per exchangeTimezoneName
+market_holidays_df = pd.read_excel(INPUT_FIELDS_FILE_PATH, sheet_name="market_holidays")
+MARKET_HOLIDAYS = {
+    tz_name: frozenset(date.fromisoformat(str(d)[:10]) for d in group["date"])
+    for tz_name, group in market_holidays_df.groupby("exchangeTimezoneName")
+}
+
+
+def market_data_ttl(trading_period, now=None):
+    """
+    Returns how many seconds the market data of a ticker can be cached.
+
+    While the regular session of the exchange is open prices move, so the TTL is
+    short. Outside the session the TTL is long, but never runs past the next open.
+    """
+    regular = (trading_period or {}).get("regular") or {}
+    start, end = regular.get("start"), regular.get("end")
+    if start is None or end is None:
+        return MARKET_DATA_TTL_OPEN
+
+    now = now or time.time()
+    if start <= now < end:
+        return MARKET_DATA_TTL_OPEN
+
+    # currentTradingPeriod describes today's session, so the next open is either
+    # later today (pre-market) or, at the earliest, the same time tomorrow
+    next_open = start if now < start else start + DAY
+    return int(max(MARKET_DATA_TTL_OPEN, min(MARKET_DATA_TTL_CLOSED, next_open - now)))
+
+
+class RefreshPlanner:
+    """
+    Decides which stored rows need a fetch: a row whose exchange has not opened a
+    regular session since its data was fetched (and settled) cannot have changed.
+
+    Sessions are rebuilt from the row's exchangeTimezoneName and the local open
+    and close times of its last regularSessionStart / regularSessionEnd, skipping
+    weekends and MARKET_HOLIDAYS. Anything that cannot be planned is fetched.
+    """
+
+    # markets whose regular session lasts this long (crypto, futures) never close
+    ALWAYS_OPEN_SESSION = 20 * 60 * 60
+
+    def __init__(self, holidays=None, settle_grace=REFRESH_SETTLE_GRACE):
+        self.holidays = MARKET_HOLIDAYS if holidays is None else holidays
+        self.settle_grace = settle_grace
+
+        self._lock = threading.Lock()
+        self._stats = {"planned": 0, "skipped": 0}
+
+    def _next_session(self, tz, open_time, close_time, holidays, after):
+        """returns (open, close) epoch seconds of the first session closing after after"""
+        day = datetime.fromtimestamp(after, tz).date() - timedelta(days=1)
+        for _ in range(15):
+            if day.weekday() < 5 and day not in holidays:
+                session_open = tz.localize(datetime.combine(day, open_time)).timestamp()
+                session_close = tz.localize(datetime.combine(day, close_time)).timestamp()
+                if session_close > after:
+                    return session_open, session_close
+            day += timedelta(days=1)
+        return None
+
+    def needs_refresh(self, raw_data, now=None):
+        """False only if no regular session has opened since raw_data settled"""
+        now = time.time() if now is None else now
+        fetched_at = raw_data.get("fetchedAt")
+        start = raw_data.get("regularSessionStart")
+        end = raw_data.get("regularSessionEnd")
+        tz_name = raw_data.get("exchangeTimezoneName")
+        if None in (fetched_at, start, end, tz_name):
+            return True
+        if end - start >= self.ALWAYS_OPEN_SESSION:
+            return True
+        try:
+            tz = pytz.timezone(tz_name)
+        except pytz.UnknownTimeZoneError:
+            return True
+
+        open_time = datetime.fromtimestamp(start, tz).time()
+        close_time = datetime.fromtimestamp(end, tz).time()
+        # the data of a session keeps settling for a while after the close
+        session = self._next_session(
+            tz,
+            open_time,
+            close_time,
+            self.holidays.get(tz_name, frozenset()),
+            fetched_at - self.settle_grace,
+        )
+        return session is None or session[0] <= now
+
+    def plan(self, raw_data_list, now=None):
+        """splits raw_data_list into (rows to fetch, rows to keep as they are)"""
+        to_fetch, to_skip = [], []
+        for raw_data in raw_data_list:
+            (to_fetch if self.needs_refresh(raw_data, now) else to_skip).append(raw_data)
+
+        with self._lock:
+            self._stats["planned"] += len(raw_data_list)
+            self._stats["skipped"] += len(to_skip)
+        return to_fetch, to_skip
+
+    def get_stats(self):
+        """
+        Returns counts since start (or since reset_stats) for this process:
+            planned: rows considered for a refresh
+            skipped: fetches avoided because the market stayed closed
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = 0
+
+
+refresh_planner = RefreshPlanner()
@@ -0,0 +1,289 @@
+"""
+Per-callback metrics, served in the Prometheus text format on /metrics (app.py).
+
+Every Dash callback is measured as a whole: its wall time, the MongoDB commands
+it sent (seen by MongoCommandListener, registered on the client in
+models/database.py) with the BSON size of each command and reply, and the
+upstream HTTP requests it made (http_get in utils/http_client.py). The counts go
+into a Tally held in a context variable while the callback runs, and are added
+to the histograms in one metrics_cache transaction when it ends, so that /metrics
+shows the totals of every gunicorn worker and background callback process, not
+just those of the worker answering the scrape.
+
+Regular callbacks are measured by request hooks (instrument_callbacks), background
+callbacks in their job process (PerJobDiskcacheManager in utils/cache_setup.py).
+Commands and requests made outside a callback (cron jobs, migrations) are not
+recorded.
+"""
+
+import contextvars
+import functools
+import math
+import threading
+import time
+
+import bson
+import flask
+from pymongo import monitoring
+
+from utils.cache_setup import metrics_cache
+
+METRICS_KEY = "metrics"
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250, 1000)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# name: (help, buckets)
+HISTOGRAMS = {
+    "dash_callback_duration_seconds": ("Wall time of a callback", LATENCY_BUCKETS),
+    "dash_callback_mongo_ops": ("MongoDB commands (round trips) sent by a callback", COUNT_BUCKETS),
+    "dash_callback_mongo_bytes": (
+        "BSON bytes of the MongoDB commands and replies of a callback",
+        BYTES_BUCKETS,
+    ),
+    "dash_callback_upstream_fetches": (
+        "Upstream HTTP requests made by a callback",
+        COUNT_BUCKETS,
+    ),
+}
+
+# name: help
+COUNTERS = {
+    "dash_callback_mongo_commands_total": "MongoDB commands sent by callbacks, by command name",
+}
+
+_current = contextvars.ContextVar("callback_tally", default=None)
+
+
+class Tally:
+    """What one callback did so far. Shared by the threads it fans out to."""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.started = time.perf_counter()
+        self.mongo_commands = {}  # command name -> count
+        self.mongo_bytes = 0
+        self.upstream_fetches = 0
+        self._lock = threading.Lock()
+
+    def add_mongo_command(self, command_name, size):
+        with self._lock:
+            self.mongo_commands[command_name] = self.mongo_commands.get(command_name, 0) + 1
+            self.mongo_bytes += size
+
+    def add_mongo_bytes(self, size):
+        with self._lock:
+            self.mongo_bytes += size
+
+    def add_upstream_fetch(self):
+        with self._lock:
+            self.upstream_fetches += 1
+
+
+def start_callback(callback):
+    """starts measuring callback in the current context; returns the token for end_callback"""
+    return _current.set(Tally(callback))
+
+
+def end_callback(token):
+    """stops the measurement started by start_callback and records it"""
+    tally = _current.get()
+    _current.reset(token)
+    if tally is not None:
+        _record(tally, time.perf_counter() - tally.started)
+
+
+def measure_callback(fn):
+    """fn measured as a callback of its own name"""
+
+    @functools.wraps(fn)
+    def measured(*args, **kwargs):
+        token = start_callback(fn.__name__)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            end_callback(token)
+
+    return measured
+
+
+def bind_callback_tally(fn):
+    """
+    fn counting into the tally of the current callback, for running on another
+    thread (a new thread does not inherit the context variables)
+    """
+    tally = _current.get()
+
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        token = _current.set(tally)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return bound
+
+
+def record_upstream_fetch():
+    tally = _current.get()
+    if tally is not None:
+        tally.add_upstream_fetch()
+
+
+def _bson_size(document):
+    try:
+        return len(bson.encode(document))
+    except Exception:
+        return 0
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Counts the commands sent while a callback is measured, and their bytes.
+    pymongo publishes the events on the thread running the command, so they land
+    in that callback's tally; the documents are only encoded inside a callback.
+    """
+
+    def started(self, event):
+        tally = _current.get()
+        if tally is not None:
+            tally.add_mongo_command(event.command_name, _bson_size(event.command))
+
+    def succeeded(self, event):
+        tally = _current.get()
+        if tally is not None:
+            tally.add_mongo_bytes(_bson_size(event.reply))
+
+    def failed(self, event):
+        pass
+
+
+def instrument_callbacks(app):
+    """
+    Measures the regular callbacks of the Dash app, from the start of the
+    _dash-update-component request to its teardown. Background callbacks are
+    skipped here: the request only starts or polls the job.
+    """
+
+    def _start():
+        request = flask.request
+        if not request.path.endswith("/_dash-update-component") or request.args.get("cacheKey"):
+            return
+        body = request.get_json(silent=True) or {}
+        output = body.get("output")
+        callback = app.callback_map.get(output)
+        if callback is None or callback.get("background"):
+            return
+        name = getattr(callback.get("callback"), "__name__", output)
+        flask.g.metrics_token = start_callback(name)
+
+    def _end(exc):
+        token = flask.g.pop("metrics_token", None)
+        if token is not None:
+            end_callback(token)
+
+    app.server.before_request(_start)
+    app.server.teardown_request(_end)
+
+
+def _observe(histograms, name, labels, value):
+    buckets = HISTOGRAMS[name][1]
+    series = histograms.get((name, labels))
+    if series is None or len(series["counts"]) != len(buckets) + 1:
+        # new, or recorded with other buckets before a deploy
+        series = {"counts": [0] * (len(buckets) + 1), "sum": 0, "count": 0}
+        histograms[(name, labels)] = series
+    i = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+    series["counts"][i] += 1
+    series["sum"] += value
+    series["count"] += 1
+
+
+def _record(tally, duration):
+    labels = (("callback", tally.callback),)
+    with tally._lock:
+        mongo_commands = dict(tally.mongo_commands)
+        observations = {
+            "dash_callback_duration_seconds": duration,
+            "dash_callback_mongo_ops": sum(mongo_commands.values()),
+            "dash_callback_mongo_bytes": tally.mongo_bytes,
+            "dash_callback_upstream_fetches": tally.upstream_fetches,
+        }
+
+    try:
+        with metrics_cache.transact():
+            state = metrics_cache.get(METRICS_KEY) or {"histograms": {}, "counters": {}}
+            for name, value in observations.items():
+                _observe(state["histograms"], name, labels, value)
+            counters = state["counters"]
+            for command_name, n in mongo_commands.items():
+                key = (
+                    "dash_callback_mongo_commands_total",
+                    labels + (("command", command_name),),
+                )
+                counters[key] = counters.get(key, 0) + n
+            metrics_cache.set(METRICS_KEY, state)
+    except Exception as e:
+        # metrics must never fail the callback
+        print(f"Warning: could not record metrics of {tally.callback}: {e}")
+
+
+def reset_metrics():
+    metrics_cache.delete(METRICS_KEY)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def render_metrics(gauges=()):
+    """
+    Returns every histogram and counter in the Prometheus text format, followed
+    by gauges, a list of (name, help, value)
+    """
+    state = metrics_cache.get(METRICS_KEY) or {"histograms": {}, "counters": {}}
+    lines = []
+
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for (series_name, labels), series in sorted(state["histograms"].items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, n in zip(buckets + (math.inf,), series["counts"]):
+                cumulative += n
+                bucket_labels = _format_labels(labels + (("le", _format_value(bound)),))
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(series['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {series['count']}")
+
+    for name, help_text in COUNTERS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for (series_name, labels), value in sorted(state["counters"].items()):
+            if series_name == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for name, help_text, value in gauges:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
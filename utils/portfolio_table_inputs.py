@@ -243,6 +243,12 @@ portfolio_table_dash_grid_options = {
     "undoRedoCellEditingLimit": 20,
     "defaultColGroupDef": {"marryChildren": True},
     "suppressClickEdit": False,
+    # rows whose latest refresh failed keep their stored values but are highlighted;
+    # rows not yet refreshed by a running Reload are greyed out
+    "rowClassRules": {
+        "refresh-error-row": "params.data.refreshError != null",
+        "stale-row": "params.data.isStale === true",
+    },
 }
 
 portfolio_table_persisted_props = [
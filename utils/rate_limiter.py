@@ -0,0 +1,99 @@
+"""
+Token bucket rate limiter shared by every thread and gunicorn worker.
+
+The bucket state (tokens, last update time) lives in a diskcache entry and is
+updated in a transaction. A caller that finds the bucket empty reserves the next
+token anyway, driving the count negative, and sleeps until that token is due, so
+waiting callers are served in order without polling. The negative part of the
+count is the number of callers queued across all workers.
+"""
+
+import threading
+import time
+
+from utils.reference import CHART_RATE_LIMIT, CHART_RATE_BURST
+
+
+class RateLimiter:
+    def __init__(self, cache, key, rate=CHART_RATE_LIMIT, burst=CHART_RATE_BURST):
+        """rate is in tokens per second (0 disables the limiter), burst is the bucket size"""
+        self.cache = cache
+        self.key = f"rate_limiter:{key}"
+        self.rate = rate
+        self.burst = max(burst, 1)
+
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._stats = {"acquired": 0, "delayed": 0, "total_wait": 0.0, "max_wait": 0.0}
+
+    def _take(self, tokens_delta=-1.0):
+        """
+        Refills the bucket, adds tokens_delta to it and returns the resulting
+        token count (negative = tokens reserved ahead of time).
+        """
+        with self.cache.transact():
+            now = time.time()
+            tokens, updated = self.cache.get(self.key, (float(self.burst), now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            tokens += tokens_delta
+            self.cache.set(self.key, (tokens, now))
+        return tokens
+
+    def acquire(self):
+        """blocks until a token is available and returns the time waited in seconds"""
+        if self.rate <= 0:
+            return 0.0
+
+        tokens = self._take()
+        wait = -tokens / self.rate if tokens < 0 else 0.0
+
+        with self._lock:
+            self._stats["acquired"] += 1
+            if wait > 0:
+                self._stats["delayed"] += 1
+                self._stats["total_wait"] += wait
+                self._stats["max_wait"] = max(self._stats["max_wait"], wait)
+                self._waiting += 1
+
+        if wait > 0:
+            try:
+                time.sleep(wait)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+        return wait
+
+    def penalize(self, seconds):
+        """
+        Empties the bucket for seconds, e.g. after a 429 with Retry-After, so that
+        every thread and worker slows down, not only the one that was throttled.
+        """
+        if self.rate <= 0 or seconds <= 0:
+            return
+        with self.cache.transact():
+            tokens = self._take(0.0)
+            self.cache.set(self.key, (min(tokens, -seconds * self.rate), time.time()))
+
+    def queue_depth(self):
+        """number of callers, across all workers, waiting for a reserved token"""
+        if self.rate <= 0:
+            return 0
+        return max(0, int(-self._take(0.0) + 0.999))
+
+    def get_stats(self):
+        """
+        Returns counts since start (or since reset_stats) for this process:
+            acquired: tokens taken
+            delayed: acquisitions that had to wait
+            total_wait / max_wait: seconds waited in total / at most
+            waiting: threads of this process waiting right now
+            queue_depth: callers waiting across all workers right now
+        """
+        with self._lock:
+            stats = dict(self._stats, waiting=self._waiting)
+        stats["queue_depth"] = self.queue_depth()
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.update(acquired=0, delayed=0, total_wait=0.0, max_wait=0.0)
@@ -1,7 +1,90 @@
+import os
 from pathlib import Path
+from utils.enums import FreqMode
 
 INPUT_FIELDS_FILE_PATH = (
     Path(__file__).parent.parent / "data" / "input_column_definitions.xlsx"
 )
-YAHOO_BASE_URL = "https://redacted_website.com"
-YAHOO_SEARCH_URL = "https://redacted_website/search?q="
+# Directory of the diskcache caches (utils/cache_setup.py); benchmarks point it at
+# a temporary directory so that clearing their caches leaves the app's alone
+CACHE_DIR = Path(os.getenv("CACHE_DIR", "."))
+# point these at benchmarks/stand_in_server.py to run without the live API
+YAHOO_BASE_URL = os.getenv("YAHOO_BASE_URL", "https://redacted_website.com")
+YAHOO_SEARCH_URL = os.getenv("YAHOO_SEARCH_URL", "https://redacted_website/search?q=")
+
+# Max number of tickers fetched in parallel by RawDataList.refresh_all (1 = serial)
+REFRESH_MAX_WORKERS = int(os.getenv("REFRESH_MAX_WORKERS", "8"))
+# Number of rows refresh_all reads, fetches and writes back (one bulk_write) at a time
+REFRESH_WRITE_BATCH_SIZE = int(os.getenv("REFRESH_WRITE_BATCH_SIZE", "100"))
+# Seconds after fetchedAt a row is stale; stale rows are refreshed in the
+# background when the page opens
+FRESHNESS_TTL = {
+    FreqMode.DAILY: int(os.getenv("FRESHNESS_TTL_DAILY", str(15 * 60))),
+    FreqMode.WEEKLY: int(os.getenv("FRESHNESS_TTL_WEEKLY", str(4 * 60 * 60))),
+    FreqMode.MONTHLY: int(os.getenv("FRESHNESS_TTL_MONTHLY", str(24 * 60 * 60))),
+}
+# Number of refreshed rows the Reload button pushes to the grid at a time
+RELOAD_BATCH_SIZE = int(os.getenv("RELOAD_BATCH_SIZE", "20"))
+
+# Shared HTTP client (utils/http_client.py) settings
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+# number of distinct hosts kept in the pool, and open connections kept per host
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", str(max(REFRESH_MAX_WORKERS, 10))))
+# retries of 429/5xx responses, with exponential backoff (seconds) unless Retry-After is sent;
+# HTTP_BACKOFF_MAX also caps the wait a Retry-After asks for
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+
+# Chart API circuit breaker (utils/circuit_breaker.py): consecutive upstream failures
+# that open it, and seconds before a half-open probe is let through
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+# Chart API rate limit (utils/rate_limiter.py) shared by all threads and workers:
+# requests per second (0 = unlimited) and burst size
+CHART_RATE_LIMIT = float(os.getenv("CHART_RATE_LIMIT", "10"))
+CHART_RATE_BURST = int(os.getenv("CHART_RATE_BURST", "20"))
+
+# Shared market data cache (utils/cache_setup.py) settings, TTLs in seconds
+MARKET_DATA_TTL_OPEN = int(os.getenv("MARKET_DATA_TTL_OPEN", "60"))
+MARKET_DATA_TTL_CLOSED = int(os.getenv("MARKET_DATA_TTL_CLOSED", str(6 * 60 * 60)))
+MARKET_DATA_CACHE_SIZE_LIMIT = int(
+    os.getenv("MARKET_DATA_CACHE_SIZE_LIMIT", str(64 * 1024 * 1024))
+)
+
+# Single-flight chart fetches (utils/single_flight.py): how long a worker's in-flight
+# lock is honoured by the other workers, and how often they poll for its result
+SINGLE_FLIGHT_LOCK_EXPIRE = float(os.getenv("SINGLE_FLIGHT_LOCK_EXPIRE", "60"))
+SINGLE_FLIGHT_POLL_INTERVAL = float(os.getenv("SINGLE_FLIGHT_POLL_INTERVAL", "0.05"))
+
+# Seconds after an exchange's close during which its data may still change; the
+# refresh planner (utils/market_hours.py) only skips rows fetched after that
+REFRESH_SETTLE_GRACE = int(os.getenv("REFRESH_SETTLE_GRACE", str(30 * 60)))
+
+# Local daily bar history (models/price_history.py): refreshes only download this
+# range and merge it in; a full 5y backfill is forced once the history is this old
+PRICE_HISTORY_REFRESH_RANGE = os.getenv("PRICE_HISTORY_REFRESH_RANGE", "1mo")
+PRICE_HISTORY_MAX_AGE = int(os.getenv("PRICE_HISTORY_MAX_AGE", str(30 * 24 * 60 * 60)))
+PRICE_HISTORY_CACHE_SIZE_LIMIT = int(
+    os.getenv("PRICE_HISTORY_CACHE_SIZE_LIMIT", str(256 * 1024 * 1024))
+)
+
+# MongoDB client (models/database.py), created lazily in each process: database
+# name, connections per pool, and timeouts in milliseconds
+MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "mydb")
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "20"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", str(5 * 60 * 1000)))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(
+    os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "10000")
+)
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "30000"))
+
+# /metrics (app.py, utils/metrics.py): how long the MongoDB readiness ping is
+# reused, and an optional bearer token the scraper must send
+MONGODB_READY_CACHE_TTL = float(os.getenv("MONGODB_READY_CACHE_TTL", "15"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
@@ -0,0 +1,38 @@
+"""
+Username of the logged-in user of the current callback.
+
+Regular callbacks read it from the flask session. Background callbacks run in a
+separate process without the request; there the signed session cookie, which
+dash hands to the job with the rest of the callback context, is verified and
+decoded with the app's secret key instead.
+"""
+
+import dash
+import flask
+
+
+def current_username():
+    """returns the logged-in username, or None outside a logged-in callback"""
+    if flask.has_request_context():
+        return flask.session.get("user")
+
+    try:
+        server = dash.get_app().server
+        cookie = dash.callback_context.cookies.get(server.config["SESSION_COOKIE_NAME"])
+    except Exception:
+        # not in a callback
+        return None
+    if not cookie:
+        return None
+
+    serializer = server.session_interface.get_signing_serializer(server)
+    if serializer is None:
+        return None
+    try:
+        session = serializer.loads(
+            cookie, max_age=int(server.permanent_session_lifetime.total_seconds())
+        )
+    except Exception:
+        # tampered with or expired
+        return None
+    return session.get("user")
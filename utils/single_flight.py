@@ -0,0 +1,112 @@
+"""
+Single-flight deduplication of concurrent fetches of the same key.
+
+Callers in one process share an in-flight Future, so only the first caller
+fetches and the others wait for its result (or exception). Across gunicorn
+workers, the fetching process holds a short-lived lock entry in a shared
+diskcache; a worker that finds the lock taken polls for the result the other
+worker stores instead of fetching again, and only fetches itself if the other
+worker gives up or fails.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from utils.reference import SINGLE_FLIGHT_LOCK_EXPIRE, SINGLE_FLIGHT_POLL_INTERVAL
+
+
+class SingleFlight:
+    def __init__(
+        self,
+        cache,
+        lock_expire=SINGLE_FLIGHT_LOCK_EXPIRE,
+        poll_interval=SINGLE_FLIGHT_POLL_INTERVAL,
+    ):
+        self.cache = cache
+        self.lock_expire = lock_expire
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._stats = {"fetches": 0, "coalesced": 0, "coalesced_across_workers": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def do(self, key, fetch, lookup):
+        """
+        Returns fetch() for key, unless key is already being fetched by another
+        thread of this process or by another worker.
+
+        fetch must store its result where lookup() finds it (returning None while
+        it is not there), which is how workers pick up each other's results.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(self._do_across_workers(key, fetch, lookup))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result()
+
+    def _do_across_workers(self, key, fetch, lookup):
+        lock_key = f"single_flight:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_expire
+
+        while not self.cache.add(lock_key, token, expire=self.lock_expire):
+            if time.monotonic() >= deadline:
+                # the other worker did not finish in time; fetch without the lock
+                token = None
+                break
+            time.sleep(self.poll_interval)
+            value = lookup()
+            if value is not None:
+                self._count("coalesced_across_workers")
+                return value
+
+        try:
+            # another worker may have stored the result just before we took the lock
+            value = lookup()
+            if value is not None:
+                self._count("coalesced_across_workers")
+                return value
+
+            self._count("fetches")
+            return fetch()
+        finally:
+            if token is not None:
+                with self.cache.transact():
+                    if self.cache.get(lock_key) == token:
+                        self.cache.delete(lock_key)
+
+    def get_stats(self):
+        """
+        Returns counts since start (or since reset_stats) for this process:
+            fetches: fetches actually run
+            coalesced: callers that shared a fetch already in flight in this process
+            coalesced_across_workers: callers served by another worker's fetch
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = 0